@@ -0,0 +1,86 @@
+import json
+import zlib
+from functools import cached_property
+from Tree import tree_to_columns, columns_to_tree, columns_to_physics
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# --- LEGACY MAP ARCHIVES ---
+# Maps used to be saved as one compact blob each: a string table, name/description
+# indexes into it, a parent-index array and integer positions in the same row order.
+# New saves go to the subtree store (Storage.py); this only reads the old blobs so
+# they can be moved over, plus the position/physics helpers both formats share.
+#
+# Layout: MAGIC (4 bytes) | codec (1 byte) | payload
+MAGIC = b"NMA1"
+CODECS = {b"n": "none", b"z": "zlib", b"s": "zstd"}
+
+
+def positions_to_xy(ids, positions):
+    # Flat [x0, y0, x1, y1, ...] integers in row order
+    xy = []
+    for node_id in ids:
+        point = positions.get(node_id, {"x": 0, "y": 0})
+        xy.append(round(point["x"]))
+        xy.append(round(point["y"]))
+    return xy
+
+
+def physics_from_tree(tree, xy=None):
+    # Re-walk the tree so ids come out exactly as parse_tree_to_physics makes them
+    columns = tree_to_columns(tree)
+    positions = None
+    if xy:
+        positions = {
+            node_id: {"x": xy[2 * row], "y": xy[2 * row + 1]}
+            for row, node_id in enumerate(columns["id"])
+        }
+    return columns_to_physics(columns, positions)
+
+
+def is_archive(blob):
+    return isinstance(blob, (bytes, bytearray, memoryview)) and bytes(blob[:4]) == MAGIC
+
+
+def unpack_map(blob):
+    blob = bytes(blob)
+    if not is_archive(blob):
+        raise ValueError("Not a map archive")
+    codec = CODECS.get(blob[4:5])
+    payload = blob[5:]
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("Archive is zstd-compressed but the zstandard package is not installed")
+        payload = zstandard.ZstdDecompressor().decompress(payload)
+    elif codec == "zlib":
+        payload = zlib.decompress(payload)
+    elif codec is None:
+        raise ValueError("Unknown archive codec")
+    return ArchivedMap(json.loads(payload))
+
+
+class ArchivedMap:
+    """Decoded archive. The tree and physics views are only built when first asked for."""
+
+    def __init__(self, body):
+        self._body = body
+
+    @cached_property
+    def tree(self):
+        strings = self._body["s"]
+        return columns_to_tree({
+            "name": [strings[i] for i in self._body["n"]],
+            "description": [strings[i] for i in self._body["d"]],
+            "parent": self._body["p"],
+        })
+
+    @property
+    def xy(self):
+        return self._body.get("xy")
+
+    @cached_property
+    def physics(self):
+        return physics_from_tree(self.tree, self.xy)
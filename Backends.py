@@ -0,0 +1,171 @@
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from Synthetic import synthetic_tree
+
+# --- GENERATION BACKENDS ---
+# Gemini.py talks to whichever backend is selected through two calls:
+#   generate(request) -> (json_text, usage)
+#   stream(request)   -> iterator of (text_chunk, usage_or_None)
+# request is {"kind": "map", "topic", "complexity", "lazy"} or
+#            {"kind": "expand", "path", "complexity"}
+# usage is {"prompt": n, "candidates": n, "total": n} (any subset).
+#
+# The backends here need no network, so the whole app can be load-tested offline:
+#   MINDMAP_LLM_BACKEND=synthetic  seeded trees
+#   MINDMAP_LLM_BACKEND=replay     recorded fixtures, seeded trees for anything missing
+
+
+class BackendError(RuntimeError):
+    """A simulated upstream failure (quota, 5xx, dropped connection)."""
+
+
+# Tree shape per complexity level: (breadth, depth, words per description)
+SHAPES = {1: (4, 2, 18), 2: (4, 3, 28), 3: (5, 3, 45)}
+
+
+def fixture_name(topic, complexity):
+    slug = re.sub(r"[^a-z0-9]+", "-", " ".join(str(topic).split()).casefold()).strip("-")
+    return f"{slug or 'topic'}.{int(complexity)}.json"
+
+
+def save_fixture(fixtures_dir, topic, complexity, tree):
+    os.makedirs(fixtures_dir, exist_ok=True)
+    with open(os.path.join(fixtures_dir, fixture_name(topic, complexity)), "w") as f:
+        json.dump(tree, f, indent=1)
+
+
+class SyntheticBackend:
+    """
+    Deterministic stand-in for Gemini. The same request always produces the same
+    tree; latency, chunking and failures are drawn from a seeded RNG.
+    """
+
+    def __init__(
+        self,
+        seed=0,
+        fixtures_dir=None,
+        latency="lognormal",
+        latency_median=2.0,
+        latency_sigma=0.5,
+        first_chunk_ratio=0.15,
+        chunk_size=256,
+        error_rate=0.0,
+        malformed_rate=0.0,
+    ):
+        self.name = "replay" if fixtures_dir else "synthetic"
+        self.model = f"offline-{self.name}"
+        self.seed = seed
+        self.fixtures_dir = fixtures_dir
+        self.latency = latency
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.first_chunk_ratio = first_chunk_ratio
+        self.chunk_size = chunk_size
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, replay=False):
+        return cls(
+            seed=int(os.getenv("MINDMAP_SYNTH_SEED", "0")),
+            fixtures_dir=os.getenv("MINDMAP_SYNTH_FIXTURES", "fixtures") if replay else None,
+            latency=os.getenv("MINDMAP_SYNTH_LATENCY", "lognormal"),
+            latency_median=float(os.getenv("MINDMAP_SYNTH_LATENCY_MEDIAN", "2.0")),
+            latency_sigma=float(os.getenv("MINDMAP_SYNTH_LATENCY_SIGMA", "0.5")),
+            chunk_size=int(os.getenv("MINDMAP_SYNTH_CHUNK", "256")),
+            error_rate=float(os.getenv("MINDMAP_SYNTH_ERROR_RATE", "0")),
+            malformed_rate=float(os.getenv("MINDMAP_SYNTH_MALFORMED_RATE", "0")),
+        )
+
+    # --- BACKEND INTERFACE ---
+    def generate(self, request):
+        text = self._text(request)
+        delay, fail, malformed = self._draw()
+        time.sleep(delay)
+        if fail:
+            raise BackendError("Injected backend failure")
+        if malformed:
+            text = text[: len(text) // 2]
+        return text, self._usage(request, text)
+
+    def stream(self, request):
+        text = self._text(request)
+        delay, fail, malformed = self._draw()
+        chunks = [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)] or [""]
+        # A slice of the latency goes before the first byte, the rest is spread over the chunks
+        time.sleep(delay * self.first_chunk_ratio)
+        gap = delay * (1 - self.first_chunk_ratio) / len(chunks)
+        for i, chunk in enumerate(chunks):
+            if fail and i >= len(chunks) // 2:
+                raise BackendError("Injected backend failure mid-stream")
+            if malformed and i >= len(chunks) // 2:
+                return
+            last = i == len(chunks) - 1
+            yield chunk, (self._usage(request, text) if last else None)
+            time.sleep(gap)
+
+    # --- INTERNALS ---
+    def _draw(self):
+        with self._rng_lock:
+            if self.latency == "fixed":
+                delay = self.latency_median
+            elif self.latency == "uniform":
+                delay = self._rng.uniform(0, 2 * self.latency_median)
+            elif self.latency == "none":
+                delay = 0.0
+            else:
+                delay = self._rng.lognormvariate(0, self.latency_sigma) * self.latency_median
+            return delay, self._rng.random() < self.error_rate, self._rng.random() < self.malformed_rate
+
+    def _request_seed(self, *parts):
+        raw = json.dumps([self.seed] + list(parts)).encode("utf-8")
+        return int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), "big")
+
+    def _text(self, request):
+        complexity = int(request.get("complexity", 1))
+        breadth, depth, words = SHAPES.get(complexity, SHAPES[2])
+
+        if request["kind"] == "expand":
+            path = request["path"]
+            node = synthetic_tree(breadth, 1, words, seed=self._request_seed("expand", path, complexity), topic=path[-1])
+            return json.dumps(node)
+
+        topic = request["topic"]
+        tree = self._fixture(topic, complexity)
+        if tree is None:
+            tree = synthetic_tree(breadth, depth, words, seed=self._request_seed("map", topic, complexity), topic=topic)
+        if request.get("lazy"):
+            for child in tree["children"]:
+                child["children"] = []
+        return json.dumps(tree)
+
+    def _fixture(self, topic, complexity):
+        if not self.fixtures_dir:
+            return None
+        path = os.path.join(self.fixtures_dir, fixture_name(topic, complexity))
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _usage(self, request, text):
+        # Roughly four characters per token, like the real tokenizer on English prose
+        prompt = 350 + len(json.dumps(request)) // 4
+        candidates = len(text) // 4
+        return {"prompt": prompt, "candidates": candidates, "total": prompt + candidates}
+
+
+def get_backend(name):
+    if name == "synthetic":
+        return SyntheticBackend.from_env()
+    if name == "replay":
+        return SyntheticBackend.from_env(replay=True)
+    raise ValueError(f"Unknown backend '{name}'")
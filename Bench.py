@@ -0,0 +1,163 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import platform
+import subprocess
+import tracemalloc
+
+# --- MAP PIPELINE BENCHMARKS ---
+# python Bench.py                 -> default scales, results in bench_results/
+# python Bench.py --quick         -> smallest scales only
+# python Bench.py --out run.json  -> explicit output file
+#
+# Every stage reports median/min wall time over --repeat runs and the peak
+# traced allocation of one extra run. Output is one JSON document per run.
+
+TREE_SCALES = [
+    # (breadth, depth)
+    (3, 3),
+    (4, 4),
+    (5, 5),
+    (6, 5),
+]
+USER_SCALES = [
+    # (users, maps per user)
+    (10, 5),
+    (100, 10),
+    (500, 20),
+]
+QUICK_TREE_SCALES = TREE_SCALES[:2]
+QUICK_USER_SCALES = USER_SCALES[:1]
+
+
+def measure(fn, repeat):
+    times = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    times.sort()
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"median_s": times[len(times) // 2], "min_s": times[0], "peak_bytes": peak}, result
+
+
+def bench_tree(breadth, depth, desc_words, repeat):
+    # Imported here so `--help` works without the app's dependencies
+    from MindMap import parse_tree_to_physics, graph_html, lod_view
+    from Gemini import get_flattened_list
+    from Synthetic import synthetic_tree
+
+    tree = synthetic_tree(breadth, depth, desc_words, seed=breadth * 100 + depth)
+    row = {"breadth": breadth, "depth": depth, "desc_words": desc_words}
+
+    row["parse_no_layout"], physics = measure(lambda: parse_tree_to_physics(tree, layout=False), repeat)
+    row["parse_with_layout"], physics = measure(lambda: parse_tree_to_physics(tree), repeat)
+    row["nodes"] = len(physics["nodes"])
+    row["flatten"], _ = measure(lambda: sum(1 for _ in get_flattened_list(tree)), repeat)
+
+    row["render_html"], html = measure(lambda: graph_html(physics), repeat)
+    row["html_bytes"] = len(html.encode("utf-8"))
+    row["lod_depth2"], (elements, _) = measure(lambda: lod_view(physics, 2), repeat)
+    row["lod_depth2_bytes"] = len(json.dumps(elements).encode("utf-8"))
+    return row
+
+
+def bench_users(users, maps_per_user, breadth, depth, repeat):
+    import Storage
+    from MindMap import load_users, save_map_to_history, parse_tree_to_physics
+    from Synthetic import synthetic_users, synthetic_tree
+
+    row = {"users": users, "maps_per_user": maps_per_user, "breadth": breadth, "depth": depth}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.sqlite3")
+        started = time.perf_counter()
+        names = synthetic_users(path, users, maps_per_user, breadth, depth, seed=users)
+        row["populate_s"] = time.perf_counter() - started
+
+        # The app's wrappers always use Storage.DB_PATH
+        previous = Storage.DB_PATH
+        Storage.DB_PATH = path
+        try:
+            tree = synthetic_tree(breadth, depth, seed=1)
+            physics = parse_tree_to_physics(tree)
+            counter = iter(range(10 ** 9))
+            row["save_map_to_history"], _ = measure(
+                lambda: save_map_to_history(names[0], f"bench {next(counter)}", tree, physics), repeat
+            )
+            row["load_users"], _ = measure(load_users, max(1, repeat // 2))
+            row["list_topics"], _ = measure(lambda: Storage.list_topics(names[-1]), repeat)
+            row["load_map"], _ = measure(lambda: Storage.load_map(names[-1], Storage.list_topics(names[-1])[0]), repeat)
+        finally:
+            Storage.DB_PATH = previous
+
+        # Fold the WAL back into the database first, or most of a fresh database is uncheckpointed log
+        with Storage.connection(path) as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        row["db_bytes"] = sum(
+            os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp) if f.startswith("bench.sqlite3")
+        )
+    return row
+
+
+def git_commit():
+    try:
+        # The checkout Bench.py lives in, wherever it's run from
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the map pipeline at synthetic scale.")
+    parser.add_argument("--quick", action="store_true", help="only the smallest scales")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--desc-words", type=int, default=25, help="words per synthetic description")
+    parser.add_argument("--skip-users", action="store_true", help="skip the storage benchmarks")
+    parser.add_argument("--out", help="output file (default: bench_results/<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    tree_scales = QUICK_TREE_SCALES if args.quick else TREE_SCALES
+    user_scales = [] if args.skip_users else (QUICK_USER_SCALES if args.quick else USER_SCALES)
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "trees": [],
+        "users": [],
+    }
+    for breadth, depth in tree_scales:
+        row = bench_tree(breadth, depth, args.desc_words, args.repeat)
+        results["trees"].append(row)
+        print(f"tree b={breadth} d={depth}: {row['nodes']} nodes, "
+              f"parse+layout {row['parse_with_layout']['median_s'] * 1000:.1f} ms, html {row['html_bytes']} B")
+    for users, maps_per_user in user_scales:
+        row = bench_users(users, maps_per_user, 3, 3, args.repeat)
+        results["users"].append(row)
+        print(f"users={users} maps={maps_per_user}: save {row['save_map_to_history']['median_s'] * 1000:.2f} ms, "
+              f"load_users {row['load_users']['median_s'] * 1000:.1f} ms, db {row['db_bytes']} B")
+
+    out = args.out
+    if not out:
+        os.makedirs("bench_results", exist_ok=True)
+        out = os.path.join("bench_results", time.strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {out}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# --- RESPONSE CACHE ---
+# Two tiers: a small in-process LRU in front of a directory of JSON files.
+CACHE_DIR = os.getenv("MINDMAP_CACHE_DIR", ".map_cache")
+
+
+def normalize_topic(topic):
+    # "  Linear   ALGEBRA " and "linear algebra" should share one entry
+    return " ".join(str(topic).split()).casefold()
+
+
+def make_key(topic, complexity, model, prompt_version):
+    raw = json.dumps([normalize_topic(topic), int(complexity), model, prompt_version])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_items=256, ttl=7 * 24 * 3600, max_disk_bytes=200 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_items = max_items
+        self.ttl = ttl
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self._disk_bytes = None
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    # --- PUBLIC API ---
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return entry[1]
+                del self._memory[key]
+
+        value, stored_at = self._read_disk(key, now)
+        with self._lock:
+            if value is None:
+                self.counters["misses"] += 1
+                return None
+            self.counters["disk_hits"] += 1
+            self._remember(key, stored_at, value)
+        return value
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            self.counters["writes"] += 1
+        self._write_disk(key, value)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["memory_items"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._disk_bytes = 0
+        if os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+    # --- MEMORY TIER ---
+    def _remember(self, key, stored_at, value):
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    # --- DISK TIER ---
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def _read_disk(self, key, now):
+        path = self._path(key)
+        try:
+            stored_at = os.path.getmtime(path)
+            if now - stored_at > self.ttl:
+                self._remove(path)
+                return None, None
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f), stored_at
+        except (OSError, ValueError):
+            return None, None
+
+    def _write_disk(self, key, value):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        size = os.path.getsize(tmp)
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp, path)
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_size()
+            else:
+                self._disk_bytes += size - old_size
+            over = self._disk_bytes > self.max_disk_bytes
+        if over:
+            self._evict()
+
+    def _scan_size(self):
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".json"):
+                total += entry.stat().st_size
+        return total
+
+    def _evict(self):
+        # Drop expired files first, then the oldest until we are under 90% of the budget
+        now = time.time()
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".json"):
+                st = entry.stat()
+                files.append((st.st_mtime, st.st_size, entry.path))
+        files.sort()
+
+        total = sum(f[1] for f in files)
+        target = self.max_disk_bytes * 0.9
+        for mtime, size, path in files:
+            if now - mtime <= self.ttl and total <= target:
+                break
+            if self._remove(path):
+                total -= size
+        with self._lock:
+            self._disk_bytes = total
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            return False
+        with self._lock:
+            self.counters["evictions"] += 1
+        return True
+
+
+# --- SINGLE-FLIGHT ---
+# Concurrent callers asking for the same key share one in-flight call.
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.counters = {"leaders": 0, "coalesced": 0}
+
+    def do(self, key, fn):
+        call, leader = self.join(key)
+        if not leader:
+            return self.wait(call)
+        try:
+            result = fn()
+        except BaseException as e:
+            self.complete(key, call, error=e)
+            raise
+        self.complete(key, call, result=result)
+        return result
+
+    def join(self, key):
+        """Returns (call, is_leader). Only the leader should do the work."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.counters["coalesced"] += 1
+                return call, False
+            call = _Call()
+            self._calls[key] = call
+            self.counters["leaders"] += 1
+            return call, True
+
+    def wait(self, call, timeout=None):
+        if not call.event.wait(timeout):
+            raise TimeoutError("Timed out waiting for an in-flight request")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def complete(self, key, call, result=None, error=None):
+        call.result = result
+        call.error = error
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.event.set()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["in_flight"] = len(self._calls)
+        return stats
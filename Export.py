@@ -0,0 +1,145 @@
+import io
+import sys
+import json
+import argparse
+from xml.sax.saxutils import escape, quoteattr
+from Gemini import get_flattened_list
+
+# --- MAP EXPORTERS ---
+# Every exporter is a generator of text chunks driven by get_flattened_list, so a
+# map goes out one node at a time and nothing recurses. The CLI streams straight
+# into its output file; the app needs the finished bytes for its download button.
+#
+#   python Export.py USER TOPIC --format opml -o roadmap.opml
+#   python Export.py --tree map.json --format md
+
+
+def iter_markdown(tree):
+    """Nested bullet outline under the root as a heading."""
+    for depth, name, description in get_flattened_list(tree):
+        if depth == 0:
+            yield f"# {name}\n\n"
+            if description:
+                yield f"{description}\n\n"
+            continue
+        indent = "  " * (depth - 1)
+        line = f"{indent}- **{name}**"
+        if description:
+            line += f": {' '.join(description.split())}"
+        yield line + "\n"
+
+
+def iter_opml(tree):
+    """OPML 2.0 outline; descriptions go in the _note attribute outliners show."""
+    root_name = tree.get("name", "")
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n<opml version="2.0">\n'
+    yield f"  <head><title>{escape(root_name)}</title></head>\n  <body>\n"
+    open_depth = -1
+    for depth, name, description in get_flattened_list(tree):
+        # Close everything at this depth or deeper before opening the next sibling/uncle
+        while open_depth >= depth:
+            yield "  " * (open_depth + 2) + "</outline>\n"
+            open_depth -= 1
+        yield "  " * (depth + 2) + f"<outline text={quoteattr(name)} _note={quoteattr(description or '')}>\n"
+        open_depth = depth
+    while open_depth >= 0:
+        yield "  " * (open_depth + 2) + "</outline>\n"
+        open_depth -= 1
+    yield "  </body>\n</opml>\n"
+
+
+def iter_graphml(tree):
+    """GraphML with label/description/depth node data and parent -> child edges."""
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+        '  <key id="label" for="node" attr.name="label" attr.type="string"/>\n'
+        '  <key id="description" for="node" attr.name="description" attr.type="string"/>\n'
+        '  <key id="depth" for="node" attr.name="depth" attr.type="int"/>\n'
+        '  <graph id="map" edgedefault="directed">\n'
+    )
+    # ancestors[d] is the id of the latest node seen at depth d
+    ancestors = []
+    for index, (depth, name, description) in enumerate(get_flattened_list(tree)):
+        node_id = f"n{index}"
+        del ancestors[depth:]
+        yield (
+            f'    <node id="{node_id}">'
+            f'<data key="label">{escape(name)}</data>'
+            f'<data key="description">{escape(description or "")}</data>'
+            f'<data key="depth">{depth}</data></node>\n'
+        )
+        if ancestors:
+            yield f'    <edge source="{ancestors[-1]}" target="{node_id}"/>\n'
+        ancestors.append(node_id)
+    yield "  </graph>\n</graphml>\n"
+
+
+def iter_jsonl(tree):
+    """One JSON object per node, pre-order, with the parent's line index (-1 for the root)."""
+    ancestors = []
+    for index, (depth, name, description) in enumerate(get_flattened_list(tree)):
+        del ancestors[depth:]
+        row = {"i": index, "parent": ancestors[-1] if ancestors else -1, "depth": depth,
+               "name": name, "description": description}
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+        ancestors.append(index)
+
+
+# format -> (chunk generator, file extension, mime type)
+EXPORTERS = {
+    "md": (iter_markdown, "md", "text/markdown"),
+    "opml": (iter_opml, "opml", "text/x-opml"),
+    "graphml": (iter_graphml, "graphml", "application/graphml+xml"),
+    "jsonl": (iter_jsonl, "jsonl", "application/x-ndjson"),
+}
+
+
+def export_to(tree, fmt, out):
+    """Streams the export into the binary file-like out. Returns the bytes written."""
+    written = 0
+    for chunk in EXPORTERS[fmt][0](tree):
+        data = chunk.encode("utf-8")
+        out.write(data)
+        written += len(data)
+    return written
+
+
+def export_bytes(tree, fmt):
+    """The whole export as bytes; st.download_button won't take an open temp file."""
+    buffer = io.BytesIO()
+    export_to(tree, fmt, buffer)
+    return buffer.getvalue()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a saved map.")
+    parser.add_argument("user", nargs="?", help="owner of the saved map")
+    parser.add_argument("topic", nargs="?", help="saved topic")
+    parser.add_argument("--tree", help="export this JSON tree file instead of a saved map")
+    parser.add_argument("--format", choices=sorted(EXPORTERS), default="md")
+    parser.add_argument("-o", "--out", help="output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    if args.tree:
+        with open(args.tree, "r", encoding="utf-8") as f:
+            tree = json.load(f)
+    elif args.user and args.topic:
+        import Storage
+        tree = Storage.load_tree(args.user, args.topic)
+        if tree is None:
+            parser.error(f"No exportable map '{args.topic}' for '{args.user}'")
+    else:
+        parser.error("give USER TOPIC or --tree FILE")
+
+    if args.out:
+        with open(args.out, "wb") as f:
+            written = export_to(tree, args.format, f)
+        print(f"{written} bytes written to {args.out}", file=sys.stderr)
+    else:
+        export_to(tree, args.format, sys.stdout.buffer)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,80 +1,574 @@
 import os
 import json
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
+import re
+import time
+import functools
+import threading
 
-# Load your API key
+# .env holds GEMINI_API_KEY, and any of the GEMINI_* / MINDMAP_* settings read at import
+# below (here and in Cache/Backends) may live there too, so it is loaded before them
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
 
+from Cache import ResponseCache, SingleFlight, make_key
+from StreamParser import TreeStreamParser
+from Tree import expand_compact
+from Metrics import metrics
+from Resilience import Caller, RetryBudget, iter_with_deadline
+import Backends
 
-def generate_learning_map(topic, complexity):
-    load_dotenv()
-    client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-    # System instructions move from the Client to the Config
-    sys_instruct = """
-    You are a structural data architect. 
-    Your only job is to produce deeply nested JSON learning maps. 
-    You have a 'Zero-List-in-Description' policy: descriptions must be prose only. 
-    All components must be represented as child nodes.
+# Without google-genai installed the app runs on the offline backends in Backends.py
+try:
+    import httpx
+    from google import genai
+    from google.genai import types
+except ImportError:
+    genai = None
+
+MODEL_NAME = "gemini-3-flash-preview"
+# Bump whenever the prompt or output shape changes so old cache entries stop matching
+PROMPT_VERSION = 2
+
+# --- OUTPUT SHAPE ---
+# The model answers in compact keys ({"n", "d", "c"}) under a response schema;
+# Tree.expand_compact turns that back into name/description/children.
+# The schema can't be recursive, so it is unrolled to a fixed number of levels.
+SCHEMA_LEVELS = {1: 3, 2: 4, 3: 5}
+LAZY_LEVELS = 2
+# Output caps per complexity; well above what a full map of that depth needs
+MAX_OUTPUT_TOKENS = {1: 4096, 2: 8192, 3: 16384}
+LAZY_MAX_OUTPUT_TOKENS = 2048
+
+# Shared by every session in this server process
+response_cache = ResponseCache()
+# Duplicate (topic, complexity) requests that arrive together wait on the first one
+inflight = SingleFlight()
+
+# --- CALL POLICY ---
+# Every model call gets a deadline; failed or malformed responses are retried with
+# jittered backoff, and an attempt still out after the observed p95 is hedged with a
+# second copy. Retries and hedges share one budget (~20% extra calls at most).
+ATTEMPT_TIMEOUT = float(os.getenv("GEMINI_ATTEMPT_TIMEOUT", "90"))
+MAX_ATTEMPTS = int(os.getenv("GEMINI_MAX_ATTEMPTS", "3"))
+HEDGE_QUANTILE = float(os.getenv("GEMINI_HEDGE_QUANTILE", "0.95"))
+# No hedging until there are enough samples for the quantile to mean something
+HEDGE_MIN_SAMPLES = 20
+STREAM_FIRST_TIMEOUT = float(os.getenv("GEMINI_STREAM_FIRST_TIMEOUT", "30"))
+STREAM_IDLE_TIMEOUT = float(os.getenv("GEMINI_STREAM_IDLE_TIMEOUT", "30"))
+
+retry_budget = RetryBudget(ratio=float(os.getenv("GEMINI_RETRY_RATIO", "0.2")))
+caller = Caller(retry_budget)
+
+
+# --- CLIENT POOL ---
+class ClientPool:
+    """
+    A handful of genai.Client instances built once per process.
+    Each client keeps its own keep-alive httpx connection pool, so TLS
+    handshakes and .env parsing happen at startup instead of per map.
+    """
+
+    def __init__(self, size=None, max_connections=None, keepalive_expiry=60.0):
+        self.size = size or int(os.getenv("GEMINI_CLIENT_POOL_SIZE", "2"))
+        self.max_connections = max_connections or int(os.getenv("GEMINI_MAX_CONNECTIONS", "20"))
+        self.keepalive_expiry = keepalive_expiry
+        self._clients = []
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if not self._clients:
+                self._clients = [self._build() for _ in range(self.size)]
+            client = self._clients[self._next % len(self._clients)]
+            self._next += 1
+            return client
+
+    def health_check(self):
+        # Cheap metadata call that exercises auth and the network path
+        started = time.perf_counter()
+        try:
+            self.get().models.get(model=MODEL_NAME)
+        except Exception as e:
+            return {"ok": False, "latency": time.perf_counter() - started, "error": str(e)}
+        return {"ok": True, "latency": time.perf_counter() - started, "error": None}
+
+    def reset(self):
+        with self._lock:
+            self._clients = []
+
+    def _build(self):
+        per_client = max(1, self.max_connections // self.size)
+        limits = httpx.Limits(
+            max_connections=per_client,
+            max_keepalive_connections=per_client,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+        return genai.Client(
+            api_key=os.getenv("GEMINI_API_KEY"),
+            # The transport gives up a little after the attempt deadline, freeing walked-away threads
+            http_options=types.HttpOptions(timeout=int((ATTEMPT_TIMEOUT + 10) * 1000), client_args={"limits": limits}),
+        )
+
+
+client_pool = ClientPool()
+
+
+# --- BACKENDS ---
+class GeminiBackend:
+    """The real thing. Same interface as the offline backends in Backends.py."""
+    name = "gemini"
+    model = MODEL_NAME
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def generate(self, request):
+        prompt, config = _prompt_for(request)
+        response = self.pool.get().models.generate_content(
+            model=MODEL_NAME,
+            contents=prompt,
+            config=config
+        )
+        return response.text, _usage(response)
+
+    def stream(self, request):
+        prompt, config = _prompt_for(request)
+        for chunk in self.pool.get().models.generate_content_stream(model=MODEL_NAME, contents=prompt, config=config):
+            yield chunk.text or "", _usage(chunk)
+
+
+def select_backend(name=None):
+    """MINDMAP_LLM_BACKEND picks gemini, synthetic or replay; gemini is the default when installed."""
+    name = name or os.getenv("MINDMAP_LLM_BACKEND") or ("gemini" if genai else "synthetic")
+    if name == "gemini":
+        if genai is None:
+            raise ImportError("google-genai is not installed; set MINDMAP_LLM_BACKEND=synthetic to run offline")
+        return GeminiBackend(client_pool)
+    return Backends.get_backend(name)
+
+
+backend = select_backend()
+
+
+def generate_learning_map(topic, complexity, use_cache=True, lazy=False):
+    # lazy=True asks for the root and its direct children only; see expand_node
+    key = make_key(topic, complexity, backend.model, _prompt_version(lazy))
+    if use_cache:
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+
+    def work():
+        mind_map = _generate_uncached(topic, complexity, lazy)
+        if use_cache:
+            response_cache.put(key, mind_map)
+        return mind_map
+
+    return inflight.do(key, work)
+
+def stream_learning_map(topic, complexity, use_cache=True, lazy=False):
+    """
+    Streaming version of generate_learning_map.
+    Yields (completed_node, partial_tree) every time a node closes; the final
+    partial_tree is the complete map. A cache hit yields the whole map at once.
     """
+    key = make_key(topic, complexity, backend.model, _prompt_version(lazy))
+    if use_cache:
+        cached = response_cache.get(key)
+        if cached is not None:
+            yield cached, cached
+            return
+
+    # Someone else is already generating this map: wait for it instead of streaming a duplicate
+    call, leader = inflight.join(key)
+    if not leader:
+        mind_map = inflight.wait(call)
+        yield mind_map, mind_map
+        return
+
+    try:
+        request = {"kind": "map", "topic": topic, "complexity": complexity, "lazy": lazy}
+        parser = TreeStreamParser()
+        started = time.perf_counter()
+        first_node = None
+        received = 0
+        usage = None
+        try:
+            chunks = iter_with_deadline(backend.stream(request), STREAM_FIRST_TIMEOUT, STREAM_IDLE_TIMEOUT)
+            for text, chunk_usage in chunks:
+                usage = chunk_usage or usage
+                if not text:
+                    continue
+                received += len(text.encode("utf-8"))
+                for depth, node in parser.feed(text):
+                    if first_node is None:
+                        first_node = time.perf_counter() - started
+                        metrics.observe("llm_first_node_seconds", first_node, call="stream")
+                    yield node, parser.partial_tree()
+            if parser.root is None:
+                raise ValueError(f"Stream for '{topic}' ended without a complete map")
+            result = parser.root
+        except Exception as e:
+            # A stalled, failed or truncated stream falls back to the retrying/hedged call path
+            metrics.observe("llm_events", 1, call="stream", event="fallback")
+            if not _retryable(e):
+                raise
+            result = _call_model(request, "generate")
+            yield result, result
+
+        metrics.observe("llm_seconds", time.perf_counter() - started, call="stream")
+        metrics.observe("llm_response_bytes", received, call="stream")
+        # Token counts arrive on the final chunk
+        _record_usage(usage, "stream")
+    except BaseException as e:
+        # GeneratorExit means the leader's session went away; don't re-raise that in the waiters
+        if not isinstance(e, Exception):
+            e = RuntimeError(f"Stream for '{topic}' was abandoned")
+        inflight.complete(key, call, error=e)
+        raise
+    if use_cache:
+        response_cache.put(key, result)
+    inflight.complete(key, call, result=result)
+
+def expand_node(path, complexity, use_cache=True):
+    """
+    Generates the children of one node on demand.
+    path is the list of names from the map's root down to the node being expanded.
+    Returns the list of new child nodes (each with an empty 'children' list).
+    """
+    key = make_key(" > ".join(path), complexity, backend.model, f"{PROMPT_VERSION}-expand")
+    if use_cache:
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+
+    def work():
+        request = {"kind": "expand", "path": list(path), "complexity": complexity}
+        children = _call_model(request, "expand").get("children", [])
+        for child in children:
+            child["children"] = []
+        if use_cache:
+            response_cache.put(key, children)
+        return children
+
+    return inflight.do(key, work)
+
+def _prompt_version(lazy):
+    return f"{PROMPT_VERSION}-lazy" if lazy else PROMPT_VERSION
+
+def _generate_uncached(topic, complexity, lazy=False):
+    request = {"kind": "map", "topic": topic, "complexity": complexity, "lazy": lazy}
+    return _call_model(request, "generate")
+
+def _call_model(request, call):
+    """One logical model call: deadlines, retries and hedging per the call policy above."""
+    def attempt():
+        started = time.perf_counter()
+        text, usage = backend.generate(request)
+        elapsed = time.perf_counter() - started
+        _record_usage(usage, call)
+        metrics.observe("llm_response_bytes", len(text.encode("utf-8")), call=call)
+        with metrics.timer("stage_seconds", stage="json_parse"):
+            result = expand_compact(json.loads(text))
+        # Only attempts that produced a usable map count: failed, timed-out and
+        # malformed ones would drag the hedging percentile around
+        metrics.observe("llm_seconds", elapsed, call=call)
+        return result
+
+    return caller.call(
+        attempt,
+        deadline=ATTEMPT_TIMEOUT,
+        max_attempts=MAX_ATTEMPTS,
+        hedge_after=_hedge_after(call),
+        retryable=_retryable,
+        on_event=lambda event: metrics.observe("llm_events", 1, call=call, event=event),
+    )
+
+def _hedge_after(call):
+    # The observed tail of successful calls of this kind, once there is one
+    if metrics.count("llm_seconds", call=call) < HEDGE_MIN_SAMPLES:
+        return None
+    return metrics.percentile("llm_seconds", HEDGE_QUANTILE, call=call)
+
+def _retryable(error):
+    # Bad requests and auth failures will fail the same way again; quota (429), 5xx,
+    # timeouts, transport errors and malformed JSON might not
+    code = getattr(error, "code", None)
+    return not (isinstance(code, int) and 400 <= code < 500 and code not in (408, 429))
+
+def _usage(response):
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return None
+    counts = {}
+    for kind in ("prompt", "candidates", "thoughts", "total"):
+        count = getattr(usage, f"{kind}_token_count", None)
+        if count is not None:
+            counts[kind] = count
+    return counts
+
+def _record_usage(usage, call):
+    for kind, count in (usage or {}).items():
+        metrics.observe("llm_tokens", count, call=call, kind=kind)
+
+def _prompt_for(request):
+    complexity = request["complexity"]
+    if request["kind"] == "expand":
+        prompt = _build_expand_request(request["path"], complexity)
+        return prompt, _config(LAZY_LEVELS, LAZY_MAX_OUTPUT_TOKENS)
+    lazy = request.get("lazy", False)
+    prompt = _build_request(request["topic"], complexity, lazy)
+    if lazy:
+        return prompt, _config(LAZY_LEVELS, LAZY_MAX_OUTPUT_TOKENS)
+    return prompt, _config(SCHEMA_LEVELS.get(complexity, 4), MAX_OUTPUT_TOKENS.get(complexity, 8192))
+
+# System instructions move from the Client to the Config
+SYS_INSTRUCT = """
+You are a structural data architect. 
+Your only job is to produce deeply nested JSON learning maps. 
+You have a 'Zero-List-in-Description' policy: descriptions must be prose only. 
+All components must be represented as child nodes.
+Nodes use short keys: "n" is the name, "d" the description, "c" the list of child nodes.
+"""
+
+def _build_request(topic, complexity, lazy=False):
+    if lazy:
+        depth_rule = "5. Produce exactly two levels: the root node and its direct children. Every child's 'c' list MUST be empty; deeper levels are generated later."
+    else:
+        depth_rule = "5. Aim for at least 3 levels of depth where appropriate (e.g., Math -> Linear Algebra -> Matrices)."
 
     prompt = f"""
         Create a comprehensive hierarchical learning roadmap for: '{topic}'.
 
         STRICT HIERARCHY RULES:
-        1. Every specific concept, sub-tool, or sub-topic MUST be its own node in the 'children' list.
-        2. The 'description' field must ONLY explain the "What" and "Why" of the current node. 
-        3. NEVER list sub-topics, bullet points, or comma-separated lists inside a 'description'. 
-        4. If you find yourself writing a list in a description, stop and move those items into the 'children' array instead.
-        5. Aim for at least 3 levels of depth where appropriate (e.g., Math -> Linear Algebra -> Matrices).
+        1. Every specific concept, sub-tool, or sub-topic MUST be its own node in the 'c' (children) list.
+        2. The 'd' (description) field must ONLY explain the "What" and "Why" of the current node. 
+        3. NEVER list sub-topics, bullet points, or comma-separated lists inside a 'd'. 
+        4. If you find yourself writing a list in a description, stop and move those items into the 'c' array instead.
+        {depth_rule}
         6. The depth of knowledge should be defined as {complexity}, where 1 is very basic, 2 is intermediate, and 3 is complex detail. At level 3, more detail and sentences may be added to the description.
 
         JSON STRUCTURE:
-        Each node must be an object: {{"name": "...", "description": "...", "children": []}}.
+        Each node must be an object: {{"n": "...", "d": "...", "c": []}}.
     """
+    return prompt
+
+def _build_expand_request(path, complexity):
+    trail = " -> ".join(path)
+
+    prompt = f"""
+        You are extending an existing learning roadmap for: '{path[0]}'.
+        Expand ONLY the node '{path[-1]}', which sits at: {trail}.
+
+        STRICT HIERARCHY RULES:
+        1. Return a single node object for '{path[-1]}' whose 'c' (children) list holds its direct sub-topics.
+        2. Every child's 'c' list MUST be empty; deeper levels are generated later.
+        3. Stay within the scope of '{path[-1]}' as it relates to its ancestors; do not repeat the ancestors themselves.
+        4. The 'd' (description) field must ONLY explain the "What" and "Why" of the node. NEVER put lists inside a 'd'.
+        5. The depth of knowledge should be defined as {complexity}, where 1 is very basic, 2 is intermediate, and 3 is complex detail.
+
+        JSON STRUCTURE:
+        Each node must be an object: {{"n": "...", "d": "...", "c": []}}.
+    """
+    return prompt
+
+@functools.lru_cache(maxsize=None)
+def _node_schema(levels):
+    """{"n", "d", "c"} object schema nested `levels` deep; the deepest level has no "c"."""
+    schema = None
+    for _ in range(levels):
+        properties = {
+            "n": types.Schema(type=types.Type.STRING),
+            "d": types.Schema(type=types.Type.STRING),
+        }
+        if schema is not None:
+            properties["c"] = types.Schema(type=types.Type.ARRAY, items=schema)
+        schema = types.Schema(
+            type=types.Type.OBJECT,
+            properties=properties,
+            required=["n", "d"],
+            property_ordering=["n", "d", "c"],
+        )
+    return schema
 
-    response = client.models.generate_content(
-        model="gemini-3-flash-preview",
-        contents=prompt,
-        config=types.GenerateContentConfig(
-            system_instruction=sys_instruct,
-            response_mime_type="application/json",
-            temperature=1.0, # Higher temperature for more detailed branching
-            thinking_config=types.ThinkingConfig(
-                thinking_level=types.ThinkingLevel.MINIMAL
-            )
+def _config(levels, max_output_tokens):
+    return types.GenerateContentConfig(
+        system_instruction=SYS_INSTRUCT,
+        response_mime_type="application/json",
+        response_schema=_node_schema(levels),
+        max_output_tokens=max_output_tokens,
+        temperature=1.0, # Higher temperature for more detailed branching
+        thinking_config=types.ThinkingConfig(
+            thinking_level=types.ThinkingLevel.MINIMAL
         )
     )
-    
-    return json.loads(response.text)
 
 def get_flattened_list(node, level=0):
     """
-    Recursively turns the JSON tree into a flat list of tuples.
+    Lazily turns the JSON tree into a flat, pre-order stream of tuples.
     Format: (depth_level, name, description)
+    Uses an explicit stack, so arbitrarily deep maps don't hit the recursion limit.
     """
-    # 1. Yield the current node first
-    yield (level, node['name'], node['description'])
-    
-    # 2. Recursively visit all children
-    if "children" in node:
-        for child in node["children"]:
-            yield from get_flattened_list(child, level + 1)
-
-# Example Usage
+    stack = [(node, level)]
+    while stack:
+        current, depth = stack.pop()
+        # 1. Yield the current node first
+        yield (depth, current['name'], current.get('description', ''))
+        # 2. Then its children, in order
+        for child in reversed(current.get("children") or []):
+            stack.append((child, depth + 1))
+
+# --- CACHE WARMING ---
+# python Gemini.py curricula.txt --complexity 1 2 --workers 4 --rate 2
+#
+# Generates every (topic, complexity) in the file into the response cache, so
+# daytime users get those maps instantly. Progress is appended to a JSONL file
+# and finished pairs are skipped on the next run, so an interrupted night resumes.
+class RateLimiter:
+    """At most `rate` starts per second across all workers (0 = unlimited)."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        time.sleep(start - now)
+
+
+def read_topics(path):
+    """
+    One topic per line; blank lines and # comments are skipped, repeats dropped.
+    A # only starts a comment at the beginning of a line or after whitespace,
+    so topics like "C# programming" survive.
+    """
+    topics = []
+    seen = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = re.split(r"(?:^|\s)#", line, maxsplit=1)[0].strip()
+            if line and line not in seen:
+                seen.add(line)
+                topics.append(line)
+    return topics
+
+
+def read_progress(path):
+    done = set()
+    if not path or not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # A line cut short by a crash
+            if entry.get("status") in ("generated", "cached"):
+                done.add((entry["topic"], entry["complexity"]))
+    return done
+
+
+def warm_cache(pairs, workers=4, rate=0.0, lazy=False, progress=None, fixtures=None, user=None, log=print):
+    """Generates each (topic, complexity) into the cache. Returns a stats dict."""
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    limiter = RateLimiter(rate)
+    progress_lock = threading.Lock()
+    counts = {"generated": 0, "cached": 0, "failed": 0}
+    latencies = []
+
+    def one(topic, complexity):
+        key = make_key(topic, complexity, backend.model, _prompt_version(lazy))
+        if response_cache.get(key) is not None:
+            return "cached", 0.0
+        limiter.wait()
+        started = time.perf_counter()
+        mind_map = generate_learning_map(topic, complexity, lazy=lazy)
+        elapsed = time.perf_counter() - started
+        if fixtures:
+            Backends.save_fixture(fixtures, topic, complexity, mind_map)
+        if user:
+            # Into a user's archive as well, laid out like a map made in the app
+            import Storage
+            from Layout import compute_layout
+            from Tree import tree_to_columns
+            columns = tree_to_columns(mind_map)
+            positions = compute_layout(columns["id"], columns["parent"])
+            Storage.save_map(user, topic, mind_map, positions, complexity=complexity)
+        return "generated", elapsed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(one, topic, complexity): (topic, complexity) for topic, complexity in pairs}
+        for n, future in enumerate(as_completed(futures), 1):
+            topic, complexity = futures[future]
+            error = None
+            try:
+                status, elapsed = future.result()
+            except Exception as e:
+                status, elapsed, error = "failed", 0.0, str(e) or type(e).__name__
+            counts[status] += 1
+            if status == "generated":
+                latencies.append(elapsed)
+            if progress:
+                entry = {"topic": topic, "complexity": complexity, "status": status,
+                         "seconds": round(elapsed, 3), "error": error, "ts": time.time()}
+                with progress_lock, open(progress, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+            wall = time.perf_counter() - started
+            log(f"[{n}/{len(futures)}] {status:<9} L{complexity} {topic}"
+                + (f" ({elapsed:.1f}s)" if status == "generated" else "")
+                + (f": {error}" if error else "")
+                + f"  | {counts['generated'] / wall:.2f} maps/s")
+
+    wall = time.perf_counter() - started
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else 0.0
+    tokens = sum(row["sum"] for name, row in metrics.summary().items()
+                 if name.startswith("llm_tokens") and 'kind="total"' in name)
+    return dict(counts, wall_s=wall, maps_per_s=counts["generated"] / wall if wall else 0.0,
+                p50_s=pick(0.5), p95_s=pick(0.95), total_tokens=tokens, retry_budget=retry_budget.stats())
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pre-generate maps into the response cache.")
+    parser.add_argument("topics", help="file with one topic per line")
+    parser.add_argument("--complexity", type=int, nargs="+", default=[1, 2, 3], choices=[1, 2, 3])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=1.0, help="max new requests per second (0 = unlimited)")
+    parser.add_argument("--lazy", action="store_true", help="warm the two-level maps LAZY_EXPAND uses")
+    parser.add_argument("--progress", help="resumable progress log (default: <topics>.progress.jsonl)")
+    parser.add_argument("--fixtures", help="also write each map as a replay fixture into this directory")
+    parser.add_argument("--user", help="also save each map into this user's archive")
+    args = parser.parse_args(argv)
+
+    progress = args.progress or args.topics + ".progress.jsonl"
+    done = read_progress(progress)
+    pairs = [(t, c) for t in read_topics(args.topics) for c in args.complexity if (t, c) not in done]
+    print(f"{len(pairs)} maps to warm ({len(done)} already done per {progress}), "
+          f"backend={backend.name}, workers={args.workers}, rate={args.rate}/s")
+    if not pairs:
+        return 0
+
+    stats = warm_cache(pairs, args.workers, args.rate, args.lazy, progress, args.fixtures, args.user)
+    print(f"\n{stats['generated']} generated, {stats['cached']} already cached, {stats['failed']} failed "
+          f"in {stats['wall_s']:.1f}s ({stats['maps_per_s']:.2f} maps/s, "
+          f"p50 {stats['p50_s']:.1f}s, p95 {stats['p95_s']:.1f}s, {stats['total_tokens']:.0f} tokens)")
+    return 1 if stats["failed"] else 0
+
+
 if __name__ == "__main__":
-    topic = "Integral ratio test" 
-    mind_map = generate_learning_map(topic)
-    
-    print(json.dumps(mind_map, indent=2))
-
-    print(f"\nMain branches for {topic}:")
-    for branch in mind_map.get('children', []):
-        print(f"- {branch['name']}")
-
-    all_nodes = list(get_flattened_list(mind_map))
-    
-    print(f"\nTotal concepts found: {len(all_nodes)}")
-    
-    for depth, name, info in all_nodes:
-        print([depth, name, info])
\ No newline at end of file
+    import sys
+    sys.exit(main())
@@ -0,0 +1,152 @@
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+import Storage
+from Metrics import metrics
+from Layout import compute_layout
+from Tree import tree_to_columns
+from Gemini import generate_learning_map
+
+# --- BACKGROUND GENERATION JOBS ---
+# RUN_ARCHITECT blocks its session until the map is done; jobs don't. Each job
+# generates, lays out and archives one map on a bounded worker pool while the
+# page keeps working. Status lives in the jobs table so any rerun can poll it.
+#
+#   MINDMAP_JOB_WORKERS   jobs running at once across all users (default 4)
+#   MINDMAP_JOB_PER_USER  jobs running at once for one user (default 2)
+#   MINDMAP_JOB_MAX_QUEUED  queued + running jobs one user may have (default 20)
+
+
+class JobLimitError(RuntimeError):
+    """The user already has as many jobs waiting as they're allowed."""
+
+
+def run_job(job):
+    tree = generate_learning_map(job["topic"], job["complexity"], lazy=job["lazy"])
+    columns = tree_to_columns(tree)
+    positions = compute_layout(columns["id"], columns["parent"])
+    saved = Storage.save_map(
+        job["username"], job["topic"], tree, positions, complexity=job["complexity"], path=job["path"]
+    )
+    if not saved:
+        raise RuntimeError(f"Could not save the map for '{job['topic']}'")
+
+
+class JobQueue:
+    def __init__(self, workers=None, per_user=None, max_queued=None, run=run_job):
+        self.workers = workers or int(os.getenv("MINDMAP_JOB_WORKERS", "4"))
+        self.per_user = per_user or int(os.getenv("MINDMAP_JOB_PER_USER", "2"))
+        self.max_queued = max_queued or int(os.getenv("MINDMAP_JOB_MAX_QUEUED", "20"))
+        self.run = run
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="mindmap-job")
+        # username -> deque of waiting jobs, in round-robin order
+        self._queues = OrderedDict()
+        self._running = {}
+        # username -> slots held by submits that are still creating their job row
+        self._reserved = {}
+        self._active = 0
+        # created_at stamp of this process's start; older unfinished jobs are orphans
+        self.started = time.strftime("%Y-%m-%d %H:%M:%S")
+        self._recovered = set()
+        self._recovery_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+    def submit(self, username, topic, complexity, lazy=False):
+        """Queues one map and returns its job id. Raises JobLimitError when the user is full."""
+        path = Storage.DB_PATH
+        self._recover(path)
+        with self._lock:
+            pending = (
+                len(self._queues.get(username, ())) + self._running.get(username, 0)
+                + self._reserved.get(username, 0)
+            )
+            if pending >= self.max_queued:
+                raise JobLimitError(f"{pending} jobs already pending; wait for some to finish")
+            # Hold the slot while the row is written so concurrent submits can't overshoot
+            self._reserved[username] = self._reserved.get(username, 0) + 1
+
+        job = None
+        try:
+            job_id = Storage.create_job(username, topic, complexity, lazy, path=path)
+            job = {
+                "id": job_id, "username": username, "topic": topic, "complexity": complexity,
+                "lazy": lazy, "path": path, "queued_at": time.perf_counter(),
+            }
+        finally:
+            with self._lock:
+                self._reserved[username] -= 1
+                if not self._reserved[username]:
+                    del self._reserved[username]
+                if job is not None:
+                    self._queues.setdefault(username, deque()).append(job)
+        self._dispatch()
+        return job_id
+
+    def list(self, username, limit=20):
+        path = Storage.DB_PATH
+        self._recover(path)
+        return Storage.list_jobs(username, limit, path=path)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "running": self._active,
+                "queued": sum(len(q) for q in self._queues.values()),
+                "users": len(set(self._queues) | set(self._running)),
+            }
+
+    def _recover(self, path):
+        # Once per database, finished before any submit or list here goes ahead: jobs left
+        # unfinished from before this process started are failed, not resumed
+        with self._recovery_lock:
+            if path in self._recovered:
+                return
+            Storage.fail_unfinished_jobs(self.started, path=path)
+            self._recovered.add(path)
+
+    def _dispatch(self):
+        with self._lock:
+            while self._active < self.workers:
+                job = self._next_job()
+                if job is None:
+                    break
+                self._active += 1
+                self._running[job["username"]] = self._running.get(job["username"], 0) + 1
+                self._pool.submit(self._work, job)
+
+    def _next_job(self):
+        # Round-robin over users, so one long batch can't starve everyone else
+        for username in list(self._queues):
+            if self._running.get(username, 0) >= self.per_user:
+                continue
+            waiting = self._queues[username]
+            job = waiting.popleft()
+            if waiting:
+                self._queues.move_to_end(username)
+            else:
+                del self._queues[username]
+            return job
+        return None
+
+    def _work(self, job):
+        metrics.observe("job_wait_seconds", time.perf_counter() - job["queued_at"])
+        try:
+            Storage.set_job_status(job["id"], "running", path=job["path"])
+            with metrics.timer(stage="job"):
+                self.run(job)
+            Storage.set_job_status(job["id"], "done", path=job["path"])
+        except Exception as e:
+            Storage.set_job_status(job["id"], "failed", error=str(e) or type(e).__name__, path=job["path"])
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._running[job["username"]] -= 1
+                if not self._running[job["username"]]:
+                    del self._running[job["username"]]
+            self._dispatch()
+
+
+# Shared by every session in this server process
+jobs = JobQueue()
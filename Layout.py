@@ -0,0 +1,133 @@
+import math
+import numpy as np
+
+# --- SERVER-SIDE GRAPH LAYOUT ---
+# Positions are computed once when a map is built and shipped to cytoscape
+# as a 'preset' layout, so the browser never runs cose itself.
+
+# The force pass runs inside the Streamlit script, so it has to stay well under a second.
+# Past FORCE_LIMIT nodes the radial layout is used as is; below it the iteration count
+# is cut so that nodes^2 * iterations stays within FORCE_BUDGET (~0.3 s).
+FORCE_LIMIT = 150
+FORCE_BUDGET = 3_000_000
+MIN_ITERATIONS = 60
+
+
+def compute_layout(ids, parents, iterations=300, seed=7, previous=None):
+    """
+    Takes the id and parent columns from Tree.tree_to_columns.
+    Returns {node_id: {"x": float, "y": float}}.
+    Force-directed for normal maps, radial tree for large ones. With previous
+    (the positions of an earlier version of the same map) existing nodes keep
+    their place and only new ones are laid out.
+    """
+    n = len(ids)
+    if n == 0:
+        return {}
+    if previous and ids[0] in previous:
+        return place_new(ids, parents, previous)
+    parent = np.asarray(parents, dtype=np.int64)
+    dst = np.nonzero(parent >= 0)[0]
+    src = parent[dst]
+
+    pos = radial_layout(n, src, dst)
+    if 2 < n <= FORCE_LIMIT:
+        iterations = min(iterations, max(MIN_ITERATIONS, FORCE_BUDGET // (n * n)))
+        pos = force_layout(pos, src, dst, iterations=iterations, seed=seed)
+    return {node_id: {"x": round(float(x), 1), "y": round(float(y), 1)} for node_id, (x, y) in zip(ids, pos)}
+
+
+def place_new(ids, parents, previous, gap=160.0, spread=0.5):
+    """
+    Keeps every position in previous and fans the nodes it lacks out from their
+    parent, pointing away from the grandparent (or the root). O(n), no force pass.
+    """
+    positions = {}
+    pending = {}
+    for row, node_id in enumerate(ids):
+        if node_id in previous:
+            positions[node_id] = previous[node_id]
+        else:
+            pending.setdefault(parents[row], []).append(row)
+
+    # Pre-order, so a new node's parent is always placed before it
+    for row, node_id in enumerate(ids):
+        if node_id in positions:
+            continue
+        parent = parents[row]
+        siblings = pending[parent]
+        here = positions[ids[parent]]
+        grand = parents[parent]
+        origin = positions[ids[grand]] if grand >= 0 else positions[ids[0]]
+        base = math.atan2(here["y"] - origin["y"], here["x"] - origin["x"]) if origin is not here else -math.pi / 2
+        k = siblings.index(row)
+        angle = base + (k - (len(siblings) - 1) / 2) * spread
+        positions[node_id] = {
+            "x": round(here["x"] + gap * math.cos(angle), 1),
+            "y": round(here["y"] + gap * math.sin(angle), 1),
+        }
+    return positions
+
+
+def radial_layout(n, src, dst, ring_gap=220.0):
+    # Root in the middle, each depth on its own ring, every subtree gets a wedge
+    # proportional to its leaf count. Node 0 is the root and rows are in pre-order.
+    children = [[] for _ in range(n)]
+    for s, t in zip(src.tolist(), dst.tolist()):
+        children[s].append(t)
+
+    order = [0]
+    depth = np.zeros(n)
+    for i in order:
+        for c in children[i]:
+            depth[c] = depth[i] + 1
+            order.append(c)
+
+    leaves = np.ones(n)
+    for i in reversed(order):
+        if children[i]:
+            leaves[i] = sum(leaves[c] for c in children[i])
+
+    angle = np.zeros(n)
+    start = {0: 0.0}
+    for i in order:
+        span = 2 * math.pi * leaves[i] / leaves[0]
+        angle[i] = start[i] + span / 2
+        cursor = start[i]
+        for c in children[i]:
+            start[c] = cursor
+            cursor += 2 * math.pi * leaves[c] / leaves[0]
+
+    radius = depth * ring_gap
+    return np.column_stack((radius * np.cos(angle), radius * np.sin(angle)))
+
+
+def force_layout(pos, src, dst, iterations=300, seed=7, ideal=160.0):
+    # Fruchterman-Reingold with every pairwise repulsion done as one array op per step
+    rng = np.random.default_rng(seed)
+    pos = pos + rng.normal(scale=1.0, size=pos.shape)
+    n = len(pos)
+    temperature = ideal * math.sqrt(n)
+    cooling = temperature / (iterations + 1)
+
+    for _ in range(iterations):
+        delta = pos[:, None, :] - pos[None, :, :]
+        dist = np.sqrt((delta ** 2).sum(axis=-1))
+        np.fill_diagonal(dist, 1.0)
+        dist = np.maximum(dist, 0.01)
+
+        # Repulsion: k^2 / d between every pair
+        disp = (delta / dist[..., None] * (ideal ** 2 / dist)[..., None]).sum(axis=1)
+
+        # Attraction: d^2 / k along every edge
+        edge_delta = pos[src] - pos[dst]
+        edge_dist = np.maximum(np.sqrt((edge_delta ** 2).sum(axis=-1)), 0.01)
+        pull = edge_delta * (edge_dist / ideal)[:, None]
+        np.subtract.at(disp, src, pull)
+        np.add.at(disp, dst, pull)
+
+        length = np.maximum(np.sqrt((disp ** 2).sum(axis=-1)), 0.01)
+        pos = pos + disp / length[:, None] * np.minimum(length, temperature)[:, None]
+        temperature = max(temperature - cooling, 1.0)
+
+    return pos - pos[0]
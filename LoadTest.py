@@ -0,0 +1,260 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# --- CONCURRENT SESSION LOAD TEST ---
+# Drives N simulated users through the real MindMap.py script with Streamlit's
+# AppTest runner: home -> signup -> RUN_ARCHITECT -> PREPARE_EXPORT -> reopen from ARCHIVE_LOGS -> SHUTDOWN.
+# Generation runs on the offline synthetic backend, so no network or quota is used.
+# AppTest sessions in one process share a single Streamlit Runtime and can't overlap,
+# so every concurrent session slot is its own worker process; they meet in the shared
+# database and disk cache, like the sessions of a multi-process deployment would.
+#
+#   python LoadTest.py --sessions 50 --concurrency 10 --latency 1.5
+#
+# Everything (database, response cache) lives in a temp directory unless --keep is given.
+
+STEPS = ("home", "signup", "generate", "export", "reopen", "shutdown")
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for MindMap.py")
+    parser.add_argument("--sessions", type=int, default=20, help="total simulated users")
+    parser.add_argument("--concurrency", type=int, default=5, help="sessions running at once")
+    parser.add_argument("--maps", type=int, default=2, help="maps generated per session")
+    parser.add_argument("--topics", type=int, default=10, help="size of the shared topic pool (overlap exercises caching)")
+    parser.add_argument("--latency", type=float, default=1.0, help="median synthetic LLM latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="injected backend failure rate")
+    parser.add_argument("--stream", action="store_true", help="keep LIVE_STREAM on")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-step script timeout")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", help="run in this directory instead of a temp one")
+    parser.add_argument("--out", help="write the report as JSON here")
+    return parser.parse_args(argv)
+
+
+def configure(args, workdir):
+    # Must happen before MindMap/Gemini are imported: both read these at import time
+    os.environ["MINDMAP_LLM_BACKEND"] = "synthetic"
+    os.environ["MINDMAP_SYNTH_LATENCY_MEDIAN"] = str(args.latency)
+    os.environ["MINDMAP_SYNTH_ERROR_RATE"] = str(args.error_rate)
+    os.environ["MINDMAP_SYNTH_SEED"] = str(args.seed)
+    os.environ["MINDMAP_DB"] = os.path.join(workdir, "loadtest.sqlite3")
+    os.environ["MINDMAP_CACHE_DIR"] = os.path.join(workdir, "cache")
+
+
+def _button(at, label, sidebar=False):
+    buttons = at.sidebar.button if sidebar else at.button
+    for b in buttons:
+        if b.label == label:
+            return b
+    raise LookupError(f"No button '{label}' on the page")
+
+
+def _input(at, label):
+    for t in at.text_input:
+        if t.label == label:
+            return t
+    raise LookupError(f"No text input '{label}' on the page")
+
+
+def _check(at, step):
+    if at.exception:
+        raise RuntimeError(f"{step}: {at.exception[0].message}")
+
+
+def run_session(index, args, topics, script):
+    """
+    One simulated user, run inside a worker process. Returns a plain dict (it crosses
+    the process boundary): timings, errors, whether it finished, and this process's
+    cumulative cache / single-flight / retry-budget stats.
+    """
+    from streamlit.testing.v1 import AppTest
+    from Gemini import inflight, response_cache, retry_budget
+
+    rng = random.Random(args.seed * 100003 + index)
+    username = f"load{index:05d}"
+    chosen = rng.sample(topics, min(args.maps, len(topics)))
+    result = {"username": username, "chosen": chosen, "timings": [], "errors": [], "ok": False}
+    at = AppTest.from_file(script, default_timeout=args.timeout)
+
+    def step(name, fn):
+        started = time.perf_counter()
+        try:
+            fn()
+            _check(at, name)
+        except Exception as e:
+            result["errors"].append(f"{name}: {e}")
+            raise
+        result["timings"].append((name, time.perf_counter() - started))
+
+    try:
+        step("home", lambda: at.run())
+        step("home", lambda: _button(at, "INITIALIZE INTERFACE").click().run())
+        _input(at, "USER ID").input(username)
+        _input(at, "PASSWORD").input("pw")
+        step("signup", lambda: _button(at, "INITIALIZE SESSION").click().run())
+
+        if not args.stream:
+            for toggle in at.toggle:
+                if toggle.label == "LIVE_STREAM":
+                    toggle.set_value(False)
+
+        for topic in chosen:
+            _input(at, "SUBJECT TARGET").input(topic)
+            step("generate", lambda: _button(at, "RUN_ARCHITECT").click().run())
+            if not any(s.value == "MAP DEPLOYED" for s in at.success):
+                result["errors"].append(f"generate: no MAP DEPLOYED for '{topic}'")
+
+        # The prepared export has to survive the rerun that renders DOWNLOAD_EXPORT
+        step("export", lambda: _button(at, "PREPARE_EXPORT").click().run())
+        step("export", lambda: at.run())
+
+        for topic in chosen:
+            step("reopen", lambda: _button(at, f"📂 {topic.upper()}", sidebar=True).click().run())
+
+        step("shutdown", lambda: _button(at, "SHUTDOWN", sidebar=True).click().run())
+        result["ok"] = True
+    except Exception:
+        pass
+    result["pid"] = os.getpid()
+    result["stats"] = {
+        "cache": response_cache.stats(),
+        "single_flight": inflight.stats(),
+        "retry_budget": retry_budget.stats(),
+    }
+    return result
+
+
+def merge_stats(per_process):
+    """Sums each process's latest counters (ratios and gauges are recomputed or dropped)."""
+    merged = {}
+    for stats in per_process.values():
+        for group, counters in stats.items():
+            target = merged.setdefault(group, {})
+            for name, value in counters.items():
+                if name not in ("hit_rate", "tokens"):
+                    target[name] = target.get(name, 0) + value
+    cache = merged.get("cache")
+    if cache:
+        lookups = cache["memory_hits"] + cache["disk_hits"] + cache["misses"]
+        cache["hit_rate"] = (cache["memory_hits"] + cache["disk_hits"]) / lookups if lookups else 0.0
+    merged["processes"] = len(per_process)
+    return merged
+
+
+def check_integrity(expected):
+    """Every map a session saw deployed must be in storage, readable, for the right user."""
+    import Storage
+
+    violations = []
+    for username, topics in expected.items():
+        if Storage.get_user(username) is None:
+            violations.append(f"{username}: user record missing")
+            continue
+        saved = set(Storage.list_topics(username))
+        for topic in topics:
+            if topic not in saved:
+                violations.append(f"{username}: lost write for '{topic}'")
+            elif not Storage.load_map(username, topic)["nodes"]:
+                violations.append(f"{username}: empty map for '{topic}'")
+        extra = saved - set(topics)
+        if extra:
+            violations.append(f"{username}: unexpected topics {sorted(extra)}")
+    return violations
+
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {}
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {"count": len(values), "p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": values[-1]}
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    tmp = None
+    workdir = args.keep
+    if not workdir:
+        tmp = tempfile.TemporaryDirectory()
+        workdir = tmp.name
+    os.makedirs(workdir, exist_ok=True)
+    configure(args, workdir)
+
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "MindMap.py")
+    topics = [f"Load Topic {i}" for i in range(args.topics)]
+
+    timings = {name: [] for name in STEPS}
+    errors = []
+    expected = {}
+    failed_sessions = 0
+    latest_stats = {}
+    # AppTest swaps the app script in as __main__ inside the workers, so the worker
+    # function has to be pickled by its module name rather than as __main__.run_session
+    import LoadTest
+
+    started = time.perf_counter()
+    # spawn: each worker starts clean and imports its own Streamlit runtime
+    with ProcessPoolExecutor(max_workers=args.concurrency, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(LoadTest.run_session, i, args, topics, script) for i in range(args.sessions)]
+        for future in futures:
+            try:
+                result = future.result()
+            except Exception as e:
+                failed_sessions += 1
+                errors.append(f"worker: {e}")
+                continue
+            for name, elapsed in result["timings"]:
+                timings[name].append(elapsed)
+            errors.extend(result["errors"])
+            latest_stats[result["pid"]] = result["stats"]
+            if result["ok"]:
+                expected[result["username"]] = result["chosen"]
+            else:
+                failed_sessions += 1
+    wall = time.perf_counter() - started
+
+    violations = check_integrity(expected)
+    report = {
+        "sessions": args.sessions,
+        "concurrency": args.concurrency,
+        "completed_sessions": len(expected),
+        "failed_sessions": failed_sessions,
+        "wall_s": wall,
+        "sessions_per_s": len(expected) / wall if wall else 0.0,
+        "maps_per_s": len(timings["generate"]) / wall if wall else 0.0,
+        "latency_s": {name: percentiles(values) for name, values in timings.items()},
+        "errors": errors[:50],
+        "error_count": len(errors),
+        "integrity_violations": violations,
+        # Per worker process, summed; single-flight only coalesces within one process
+        "counters": merge_stats(latest_stats),
+    }
+
+    print(f"{len(expected)}/{args.sessions} sessions in {wall:.1f}s "
+          f"({report['sessions_per_s']:.2f} sessions/s, {report['maps_per_s']:.2f} maps/s)")
+    for name in STEPS:
+        p = report["latency_s"][name]
+        if p:
+            print(f"  {name:<9} p50 {p['p50']:.3f}s  p95 {p['p95']:.3f}s  p99 {p['p99']:.3f}s  (n={p['count']})")
+    print(f"  errors: {len(errors)}  integrity violations: {len(violations)}")
+    for v in violations[:10]:
+        print(f"    {v}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if tmp:
+        tmp.cleanup()
+    return 1 if violations or failed_sessions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
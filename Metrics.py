@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import ContextDecorator
+
+# --- METRICS ---
+# Rolling per-series windows with p50/p95/p99, exported two ways:
+#   MINDMAP_METRICS_JSONL=path  -> every observation appended as one JSON line
+#   MINDMAP_METRICS_PROM=path   -> Prometheus text format, rewritten at most every
+#                                  PROM_INTERVAL seconds (node_exporter textfile style)
+PREFIX = "mindmap"
+PROM_INTERVAL = 10.0
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class _Series:
+    def __init__(self, window):
+        self.values = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+
+class _Timer(ContextDecorator):
+    def __init__(self, metrics, metric, labels):
+        self.metrics = metrics
+        self.metric = metric
+        self.labels = labels
+
+    def _recreate_cm(self):
+        # Each decorated call gets its own timer so concurrent calls don't share start times
+        return _Timer(self.metrics, self.metric, self.labels)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.started
+        self.metrics.observe(self.metric, self.elapsed, **self.labels)
+        return False
+
+
+class Metrics:
+    def __init__(self, window=1024, jsonl_path=None, prom_path=None):
+        self.window = window
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self._series = {}
+        self._lock = threading.Lock()
+        self._last_prom_write = 0.0
+        self._prom_lock = threading.Lock()
+
+    def observe(self, metric, value, **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(self.window)
+            series.values.append(value)
+            series.count += 1
+            series.total += value
+        if self.jsonl_path:
+            self._append_jsonl(metric, value, labels)
+        if self.prom_path and time.time() - self._last_prom_write >= PROM_INTERVAL:
+            # Whoever gets the lock writes; everyone else skips rather than waits
+            if self._prom_lock.acquire(blocking=False):
+                try:
+                    self.write_prometheus(self.prom_path)
+                finally:
+                    self._prom_lock.release()
+
+    def timer(self, metric="stage_seconds", **labels):
+        """Context manager / decorator that observes elapsed seconds."""
+        return _Timer(self, metric, labels)
+
+    def percentile(self, metric, q, **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            series = self._series.get(key)
+            values = sorted(series.values) if series else []
+        return _quantile(values, q)
+
+    def count(self, metric, **labels):
+        """Observations currently in the window."""
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            series = self._series.get(key)
+            return len(series.values) if series else 0
+
+    def summary(self):
+        """{"metric{label=...}": {"count", "sum", "p50", "p95", "p99"}}"""
+        with self._lock:
+            snapshot = [(k, sorted(s.values), s.count, s.total) for k, s in self._series.items()]
+        out = {}
+        for (metric, labels), values, count, total in snapshot:
+            row = {"count": count, "sum": total}
+            for q in QUANTILES:
+                row[f"p{int(q * 100)}"] = _quantile(values, q)
+            out[metric + _label_text(labels)] = row
+        return out
+
+    def prometheus_text(self):
+        with self._lock:
+            snapshot = [(k, sorted(s.values), s.count, s.total) for k, s in self._series.items()]
+        lines = []
+        typed = set()
+        for (metric, labels), values, count, total in sorted(snapshot, key=lambda r: r[0]):
+            name = f"{PREFIX}_{metric}"
+            if name not in typed:
+                lines.append(f"# TYPE {name} summary")
+                typed.add(name)
+            for q in QUANTILES:
+                lines.append(f"{name}{_label_text(labels + (('quantile', str(q)),))} {_quantile(values, q)}")
+            lines.append(f"{name}_sum{_label_text(labels)} {total}")
+            lines.append(f"{name}_count{_label_text(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        self._last_prom_write = time.time()
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, path)
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def _append_jsonl(self, metric, value, labels):
+        line = json.dumps({"ts": time.time(), "metric": metric, "value": value, **labels})
+        with self._lock:
+            with open(self.jsonl_path, "a") as f:
+                f.write(line + "\n")
+
+
+def _quantile(values, q):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    parts = []
+    for k, v in labels:
+        v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+# Shared by the app, Gemini.py and Storage.py
+metrics = Metrics(
+    jsonl_path=os.getenv("MINDMAP_METRICS_JSONL"),
+    prom_path=os.getenv("MINDMAP_METRICS_PROM"),
+)
@@ -3,45 +3,37 @@ import streamlit.components.v1 as components
 import json
 import time
 import os
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
 
 # --- PERSISTENCE HELPERS ---
-DB_FILE = "users_db.json"
+# Users and archives live in SQLite (see Storage.py); an old users_db.json is migrated on first start
+import Storage
+from Metrics import metrics
+from Layout import compute_layout
+from Tree import tree_to_columns, columns_to_physics, leaf_paths, graft_children
 
 # --- IMPORT FROM YOUR Gemini.py FILE ---
-# Ensure Gemini.py exists in the same directory
-try:
-    from Gemini import generate_learning_map
-except ImportError:
-    def generate_learning_map(topic):
-        return {"name": topic, "description": "Mock Data", "children": []}
+# Ensure Gemini.py exists in the same directory. Without google-genai (or with
+# MINDMAP_LLM_BACKEND=synthetic|replay) it serves maps from the offline backends in Backends.py.
+from Gemini import generate_learning_map, stream_learning_map, expand_node
+from Jobs import jobs, JobLimitError
+from Export import EXPORTERS, export_bytes
 
 # --------------------
 # 1. DATA PARSER
 # --------------------
-def parse_tree_to_physics(node, nodes=None, edges=None, parent_id=None):
-    if nodes is None: nodes = []
-    if edges is None: edges = []
-    
-    current_id = node['name'].replace(" ", "_").lower() + "_" + str(len(nodes))
-    
-    # Back to the original balanced sizes
-    node_size = 60 if parent_id is None else 40
-    
-    nodes.append({
-        "id": current_id, 
-        "label": node['name'].upper(), 
-        "size": node_size,
-        "description": node.get('description', '')
-    })
-    
-    if parent_id:
-        edges.append({"source": parent_id, "target": current_id})
-        
-    if "children" in node and node["children"]:
-        for child in node["children"]:
-            parse_tree_to_physics(child, nodes, edges, current_id)
-            
-    return {"nodes": nodes, "edges": edges}
+def parse_tree_to_physics(node, layout=True, previous=None):
+    # Iterative walk with ids hashed from each node's path (see Tree.py)
+    columns = tree_to_columns(node)
+    positions = None
+    # Positions are worked out once here and saved with the map; with previous
+    # (an expanded map's old positions) only the new nodes are placed
+    if layout:
+        positions = compute_layout(columns["id"], columns["parent"], previous=previous)
+    return columns_to_physics(columns, positions)
 
 # --------------------
 # 2. CUSTOM CSS (BLUE HUD THEME)
@@ -205,11 +197,75 @@ def load_space_background():
 # --------------------
 # 4. GRAPH ENGINE (BLUE THEME)
 # --------------------
-def render_force_graph(data):
-    cy_nodes = [{"data": n} for n in data["nodes"]]
-    cy_edges = [{"data": {"id": f"e{i}", "source": e["source"], "target": e["target"]}} for i, e in enumerate(data["edges"])]
-    
-    html_code = f"""
+# cytoscape is served from ./static (see .streamlit/config.toml) so the graph works offline
+STATIC_CYTOSCAPE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "cytoscape.min.js")
+CDN_CYTOSCAPE = "https://cdnjs.cloudflare.com/ajax/libs/cytoscape/3.34.1/cytoscape.min.js"
+
+def cytoscape_src():
+    if os.path.exists(STATIC_CYTOSCAPE):
+        return "/app/static/cytoscape.min.js"
+    return CDN_CYTOSCAPE
+
+COSE_LAYOUT = {
+    "name": "cose",
+    "animate": True,
+    "refresh": 20,
+    "fit": True,
+    "padding": 60,
+    "nodeOverlap": 150,
+    "nodeRepulsion": 4000000,
+    "idealEdgeLength": 50,
+    "edgeElasticity": 150,
+    "nestingFactor": 0.1,
+    "gravity": 0.35,
+    "numIter": 2500
+}
+
+CY_STYLE = [
+    {"selector": "node", "style": {
+        "background-color": "#fff",
+        "label": "data(label)",
+        "color": "#00d0ff",
+        "width": "data(size)",
+        "height": "data(size)",
+        "font-size": "16px",
+        "font-weight": "bold",
+        "text-valign": "center",
+        "text-halign": "right",
+        "text-margin-x": "10px",
+        "font-family": "monospace",
+        "border-width": 2,
+        "border-color": "#00a0ff",
+        "shadow-blur": 12,
+        "shadow-color": "#0088ff"
+    }},
+    {"selector": "edge", "style": {
+        "width": 3,
+        "line-color": "rgba(0, 150, 255, 0.4)",
+        "curve-style": "bezier",
+        "target-arrow-shape": "triangle",
+        "target-arrow-color": "rgba(0, 150, 255, 0.4)",
+        "arrow-scale": 1.2
+    }},
+    {"selector": ":selected", "style": {
+        "background-color": "#00ffff",
+        "shadow-blur": 25,
+        "border-color": "#fff",
+        "border-width": 4
+    }},
+    # Collapsed subtrees in the level-of-detail view
+    {"selector": "node.aggregate", "style": {
+        "background-color": "#000",
+        "color": "#88ccff",
+        "font-size": "13px",
+        "border-style": "dashed",
+        "border-color": "#00d0ff",
+        "shadow-blur": 0
+    }}
+]
+
+# The HTML shell is built once per process; each render only splices in the elements JSON
+GRAPH_HTML = """
     <div style="position: relative;">
         <div id="node-info" style="
             position: absolute;
@@ -241,87 +297,236 @@ def render_force_graph(data):
         "></div>
     </div>
 
-    <script src="https://cdnjs.cloudflare.com/ajax/libs/cytoscape/3.21.1/cytoscape.min.js"></script>
+    <script src="__CYTOSCAPE_SRC__"></script>
     <script>
-        var cy = cytoscape({{
+        var cy = cytoscape({
             container: document.getElementById('cy'),
-            elements: {{ nodes: {json.dumps(cy_nodes)}, edges: {json.dumps(cy_edges)} }},
-            style: [
-                {{ selector: 'node', style: {{ 
-                    'background-color': '#fff', 
-                    'label': 'data(label)', 
-                    'color': '#00d0ff', 
-                    'width': 'data(size)', 
-                    'height': 'data(size)', 
-                    'font-size': '16px',
-                    'font-weight': 'bold',
-                    'text-valign': 'center', 
-                    'text-halign': 'right', 
-                    'text-margin-x': '10px',
-                    'font-family': 'monospace', 
-                    'border-width': 2, 
-                    'border-color': '#00a0ff', 
-                    'shadow-blur': 12, 
-                    'shadow-color': '#0088ff' 
-                }} }},
-                {{ selector: 'edge', style: {{ 
-                    'width': 3,
-                    'line-color': 'rgba(0, 150, 255, 0.4)', 
-                    'curve-style': 'bezier',
-                    'target-arrow-shape': 'triangle',
-                    'target-arrow-color': 'rgba(0, 150, 255, 0.4)',
-                    'arrow-scale': 1.2
-                }} }},
-                {{ selector: ':selected', style: {{ 
-                    'background-color': '#00ffff', 
-                    'shadow-blur': 25,
-                    'border-color': '#fff',
-                    'border-width': 4
-                }} }}
-            ],
-            layout: {{ 
-                name: 'cose', 
-                animate: true, 
-                refresh: 20,
-                fit: true, 
-                padding: 60,
-                nodeOverlap: 150,
-                nodeRepulsion: 4000000,
-                idealEdgeLength: 50,
-                edgeElasticity: 150,
-                nestingFactor: 0.1, 
-                gravity: 0.35,
-                numIter: 2500
-            }}
-        }});
+            elements: __ELEMENTS__,
+            style: __STYLE__,
+            layout: __LAYOUT__
+        });
 
         // INTERACTION LOGIC
         const infoBox = document.getElementById('node-info');
         const infoTitle = document.getElementById('info-title');
         const infoDesc = document.getElementById('info-desc');
 
-        cy.on('mouseover', 'node', function(evt){{
+        cy.on('mouseover', 'node', function(evt){
             var node = evt.target;
             infoTitle.innerText = node.data('label');
             infoDesc.innerText = node.data('description') || 'No description available.';
             infoBox.style.display = 'block';
-        }});
+        });
 
-        cy.on('mouseout', 'node', function(evt){{
+        cy.on('mouseout', 'node', function(evt){
             infoBox.style.display = 'none';
-        }});
+        });
         
         // Ensure description stays if clicked
-        cy.on('select', 'node', function(evt){{
+        cy.on('select', 'node', function(evt){
             var node = evt.target;
             infoTitle.innerText = node.data('label');
             infoDesc.innerText = node.data('description') || 'No description available.';
             infoBox.style.display = 'block';
-        }});
+        });
     </script>
-    """
+"""
+
+@functools.lru_cache(maxsize=1)
+def _graph_template():
+    html = GRAPH_HTML.replace("__CYTOSCAPE_SRC__", cytoscape_src()).replace("__STYLE__", json.dumps(CY_STYLE))
+    head, rest = html.split("__ELEMENTS__")
+    middle, tail = rest.split("__LAYOUT__")
+    return head, middle, tail
+
+def content_hash(data):
+    # Computed once when a map is put on screen, not per rerun
+    return hashlib.blake2b(json.dumps(data, sort_keys=True).encode("utf-8"), digest_size=16).hexdigest()
+
+# Render payloads for recently shown maps, shared by all sessions and keyed by content hash
+_render_cache = OrderedDict()
+_render_lock = threading.Lock()
+RENDER_CACHE_SIZE = 64
+
+def _memo(key, build):
+    if key[0] is None:
+        return build()
+    with _render_lock:
+        if key in _render_cache:
+            _render_cache.move_to_end(key)
+            return _render_cache[key]
+    value = build()
+    with _render_lock:
+        _render_cache[key] = value
+        while len(_render_cache) > RENDER_CACHE_SIZE:
+            _render_cache.popitem(last=False)
+    return value
+
+def render_force_graph(data, map_hash=None):
+    # Same map -> byte-identical HTML, so Streamlit keeps the existing iframe instead of reloading it
+    html_code = _memo((map_hash, "html"), lambda: graph_html(data))
     components.html(html_code, height=820)
 
+def graph_html(data):
+    positions = data.get("positions")
+    if positions:
+        cy_nodes = [{"data": n, "position": positions[n["id"]]} for n in data["nodes"]]
+        layout = {"name": "preset", "fit": True, "padding": 60}
+    else:
+        # Maps saved before positions existed (and partial streaming maps) still lay out in the browser
+        cy_nodes = [{"data": n} for n in data["nodes"]]
+        layout = COSE_LAYOUT
+    cy_edges = [{"data": {"id": f"e{i}", "source": e["source"], "target": e["target"]}} for i, e in enumerate(data["edges"])]
+    
+    head, middle, tail = _graph_template()
+    # "</" inside a description must not close the script tag
+    elements = json.dumps({"nodes": cy_nodes, "edges": cy_edges}).replace("</", "<\\/")
+    html_code = head + elements + middle + json.dumps(layout) + tail
+    metrics.observe("render_bytes", len(html_code.encode("utf-8")), view="full")
+    return html_code
+
+# --------------------
+# 4b. LEVEL OF DETAIL (BIDIRECTIONAL COMPONENT)
+# --------------------
+# Only the visible part of the map is sent to the browser. Hidden subtrees show up
+# as one "+N" node; clicking it comes back here through the component value.
+_graph_component = components.declare_component(
+    "nebula_graph",
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend", "graph")
+)
+
+def lod_view(data, max_depth=2, expanded=(), focus=None, radius=2):
+    """
+    Picks the nodes to draw: everything down to max_depth plus the children of
+    expanded nodes, or (with focus) the root path and the radius-hop neighbourhood
+    of the focused node. Returns (elements, layout) for cytoscape.
+    """
+    nodes = data["nodes"]
+    n = len(nodes)
+    index = {node["id"]: i for i, node in enumerate(nodes)}
+    parent = [-1] * n
+    children = [[] for _ in range(n)]
+    for e in data["edges"]:
+        s, t = index[e["source"]], index[e["target"]]
+        parent[t] = s
+        children[s].append(t)
+
+    order = [0]
+    depth = [0] * n
+    for i in order:
+        for c in children[i]:
+            depth[c] = depth[i] + 1
+            order.append(c)
+    descendants = [0] * n
+    for i in reversed(order):
+        for c in children[i]:
+            descendants[i] += 1 + descendants[c]
+
+    visible = [False] * n
+    if focus in index:
+        i = index[focus]
+        while i >= 0:
+            visible[i] = True
+            i = parent[i]
+        hops = {index[focus]: 0}
+        frontier = [index[focus]]
+        while frontier:
+            i = frontier.pop()
+            visible[i] = True
+            if hops[i] == radius:
+                continue
+            for j in children[i] + ([parent[i]] if parent[i] >= 0 else []):
+                if j not in hops:
+                    hops[j] = hops[i] + 1
+                    frontier.append(j)
+    else:
+        for i in order:
+            visible[i] = depth[i] <= max_depth
+    # Expanded nodes always show their children (pre-order, so parents are settled first)
+    for i in order:
+        if parent[i] >= 0 and visible[parent[i]] and nodes[parent[i]]["id"] in expanded:
+            visible[i] = True
+
+    positions = data.get("positions")
+    cy_nodes = []
+    cy_edges = []
+    for i in order:
+        if not visible[i]:
+            continue
+        node = nodes[i]
+        element = {"data": node}
+        if positions:
+            element["position"] = positions[node["id"]]
+        cy_nodes.append(element)
+        if parent[i] >= 0:
+            cy_edges.append({"data": {"id": f"e{i}", "source": nodes[parent[i]]["id"], "target": node["id"]}})
+
+        hidden = sum(1 + descendants[c] for c in children[i] if not visible[c])
+        if hidden:
+            agg_id = node["id"] + "::more"
+            aggregate = {
+                "data": {
+                    "id": agg_id,
+                    "label": f"+{hidden}",
+                    "size": 26,
+                    "aggregate": True,
+                    "owner": node["id"],
+                    "description": f"{hidden} hidden concepts. Click to expand."
+                },
+                "classes": "aggregate"
+            }
+            if positions:
+                aggregate["position"] = _outward(positions, nodes[0]["id"], node["id"])
+            cy_nodes.append(aggregate)
+            cy_edges.append({"data": {"id": f"e{i}::more", "source": node["id"], "target": agg_id}})
+
+    layout = {"name": "preset", "fit": True, "padding": 60} if positions else COSE_LAYOUT
+    return {"nodes": cy_nodes, "edges": cy_edges}, layout
+
+def _outward(positions, root_id, node_id, step=80.0):
+    # Park the "+N" node just beyond its owner, pointing away from the root
+    root, here = positions[root_id], positions[node_id]
+    dx, dy = here["x"] - root["x"], here["y"] - root["y"]
+    length = (dx * dx + dy * dy) ** 0.5 or 1.0
+    if node_id == root_id:
+        dx, dy, length = 0.0, -1.0, 1.0
+    return {"x": here["x"] + dx / length * step, "y": here["y"] + dy / length * step}
+
+def _lod_payload(data, max_depth, expanded, focus):
+    elements, layout = lod_view(data, max_depth, expanded, focus)
+    elements_json = json.dumps(elements)
+    metrics.observe("render_bytes", len(elements_json.encode("utf-8")), view="lod")
+    return elements_json, layout
+
+def render_graph_lod(data, max_depth, map_hash=None):
+    # Expansion/focus state belongs to the map on screen; start fresh when it changes
+    view = st.session_state.get("lod")
+    if not view or view["map"] != map_hash:
+        view = st.session_state.lod = {"map": map_hash, "expanded": set(), "focus": None}
+
+    expanded = frozenset(view["expanded"])
+    elements_json, layout = _memo(
+        (map_hash, "lod", max_depth, expanded, view["focus"]),
+        lambda: _lod_payload(data, max_depth, expanded, view["focus"])
+    )
+    event = _graph_component(
+        elements_json=elements_json,
+        style=CY_STYLE,
+        layout=layout,
+        focus=view["focus"],
+        key="nebula_graph",
+        default=None
+    )
+    # The component keeps returning its last event on every rerun, whichever map is on
+    # screen, so the handled nonce lives outside the per-map view and survives map changes
+    if event and event.get("nonce") != st.session_state.get("lod_nonce"):
+        st.session_state.lod_nonce = event.get("nonce")
+        if event["action"] == "expand":
+            view["expanded"].add(event["id"])
+        elif event["action"] == "focus":
+            view["focus"] = event["id"]
+        st.rerun()
+
 # --------------------
 # 5. PAGE DEFINITIONS
 # --------------------
@@ -547,32 +752,64 @@ def home_page():
 
 # --- UPDATED PERSISTENCE HELPERS ---
 def load_users():
-    if not os.path.exists(DB_FILE):
-        return {}
-    with open(DB_FILE, "r") as f:
-        try:
-            return json.load(f)
-        except:
-            return {}
+    # Full dump in the old JSON shape; the pages use the indexed lookups below
+    return Storage.load_all()
 
 def save_user(username, password):
-    users = load_users()
-    # Store as a dict to hold password AND history
-    if username not in users:
-        users[username] = {"password": password, "history": {}}
-    with open(DB_FILE, "w") as f:
-        json.dump(users, f)
-
-def save_map_to_history(username, topic, map_data):
-    users = load_users()
-    if username in users:
-        # Save map data under the topic name
-        users[username]["history"][topic] = {
-            "data": map_data,
-            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
-        }
-        with open(DB_FILE, "w") as f:
-            json.dump(users, f)
+    # False if someone else signed up under this name first
+    return Storage.create_user(username, password)
+
+def save_map_to_history(username, topic, raw_tree, map_data, complexity=None):
+    # Only the raw tree and positions are stored; the physics dict is rebuilt on load
+    Storage.save_map(username, topic, raw_tree, map_data.get("positions"), complexity=complexity)
+
+def delete_map_from_history(username, topic):
+    # Subtrees shared with other saved maps stay; the rest are reclaimed
+    Storage.delete_map(username, topic)
+    if st.session_state.map_topic == topic:
+        show_map(None, None, None)
+
+def search_archives(username, query):
+    # FTS lookup over every node the user has saved (see Storage.search)
+    return Storage.search(username, query) if query.strip() else []
+
+def open_archived_map(username, topic, focus=None):
+    show_map(Storage.load_map(username, topic), Storage.load_tree(username, topic), topic)
+    if focus:
+        # Focus only exists in the LOD view; the toggle is switched on before it is drawn next run
+        st.session_state.lod = {"map": st.session_state.map_hash, "expanded": set(), "focus": focus}
+        st.session_state.force_lod = True
+
+def get_user_record(username):
+    """
+    The user's password, cached in the session.
+    Only goes back to storage when Storage.version() says something changed.
+    """
+    version = Storage.version()
+    cached = st.session_state.get("user_cache")
+    if cached and cached["username"] == username and cached["version"] == version:
+        return cached["record"]
+
+    record = Storage.get_user(username)
+    st.session_state.user_cache = {"username": username, "version": version, "record": record}
+    return record
+
+ARCHIVE_PAGE_SIZE = 10
+
+def get_archive_page(username, page):
+    """
+    (entries, total) for one sidebar page of the history index: topic, timestamp,
+    complexity and node count only. Cached in the session like get_user_record.
+    """
+    version = Storage.version()
+    cached = st.session_state.get("archive_cache")
+    if cached and cached["key"] == (username, page, version):
+        return cached["entries"], cached["total"]
+
+    total = Storage.count_history(username)
+    entries = Storage.list_history(username, limit=ARCHIVE_PAGE_SIZE, offset=page * ARCHIVE_PAGE_SIZE)
+    st.session_state.archive_cache = {"key": (username, page, version), "entries": entries, "total": total}
+    return entries, total
 
 # --- REFACTORED SIGNUP/LOGIN PAGE ---
 def signup_page():
@@ -591,21 +828,22 @@ def signup_page():
         with btn_col1:
             if st.button("INITIALIZE SESSION", use_container_width=True):
                 if u and p:
-                    users = load_users()
-                    users = load_users()
-                    if u in users:
+                    record = get_user_record(u)
+                    if record:
                         # Check password within the new dict structure
-                        if users[u]["password"] == p:
+                        if record["password"] == p:
                             st.session_state.user = {"name": u}
                             st.session_state.page = "generator"
                             st.rerun()
                         else:
                             st.error("CREDENTIAL MISMATCH")
-                    else:
-                        save_user(u, p)
+                    elif save_user(u, p):
                         st.session_state.user = {"name": u}
                         st.session_state.page = "generator"
                         st.rerun()
+                    else:
+                        # Taken between the lookup and the insert by another session
+                        st.error("CREDENTIAL MISMATCH")
                 else:
                     st.error("INPUT REQUIRED")
 
@@ -616,12 +854,64 @@ def signup_page():
 
         st.markdown('</div>', unsafe_allow_html=True)
 
+def show_map(map_data, raw_tree, topic):
+    # Every change to the map on screen goes through here so the render hash stays in sync
+    st.session_state.map_data = map_data
+    st.session_state.map_tree = raw_tree
+    st.session_state.map_topic = topic
+    st.session_state.map_hash = content_hash(map_data) if map_data else None
+
+def stream_to_slot(topic, complexity, slot, lazy=False, min_interval=0.75):
+    # Redraw at most every min_interval seconds so the iframe isn't rebuilt per leaf
+    partial = None
+    last_draw = 0.0
+    for node, partial in stream_learning_map(topic, complexity, lazy=lazy):
+        # Children can close before the root's name has streamed in; nothing to draw yet
+        if partial is None:
+            continue
+        if time.time() - last_draw >= min_interval:
+            with slot:
+                render_force_graph(parse_tree_to_physics(partial, layout=False))
+            last_draw = time.time()
+    return partial
+
+def get_recent_jobs(username):
+    """The user's latest jobs, cached in the session like get_archive_page: no query until Storage.version() moves."""
+    version = Storage.version()
+    cached = st.session_state.get("jobs_cache")
+    if cached and cached["key"] == (username, version):
+        return cached["jobs"]
+
+    recent = jobs.list(username, limit=8)
+    st.session_state.jobs_cache = {"key": (username, version), "jobs": recent}
+    return recent
+
+JOB_ICONS = {"queued": "⏳", "running": "⚙️", "done": "✅", "failed": "❌"}
+
+@st.fragment(run_every=2)
+def job_panel(username):
+    # Reruns on its own every two seconds; the rest of the page is left alone
+    recent = get_recent_jobs(username)
+    if not recent:
+        return
+    st.markdown("##### JOB_QUEUE")
+    for job in recent:
+        label = f"{JOB_ICONS.get(job['status'], '?')} {job['topic'].upper()}"
+        if job["status"] == "done":
+            if st.button(label, key=f"job_{job['id']}", help="Open this map", use_container_width=True):
+                open_archived_map(username, job["topic"])
+                st.rerun()
+        else:
+            st.caption(f"{label} · {job['error']}" if job["error"] else label)
+
 def generator_page():
     username = st.session_state.user['name']
     st.markdown(f"### SYSTEM LOG: {username.upper()}")
     st.markdown("<h1 style='font-weight:900;'>COMMAND_CENTER</h1><hr style='border: 2px solid white;'>", unsafe_allow_html=True)
 
     col1, col2 = st.columns([1, 3]) 
+    # Streaming draws partial maps into the same slot the finished map uses
+    graph_slot = col2.empty()
     
     with col1:
         st.markdown('<div class="glass-card">', unsafe_allow_html=True)
@@ -635,38 +925,160 @@ def generator_page():
             value=1, 
             help="1: General Knowledge | 2: Intermediate | 3: Complex Insight"
         )
+        stream_mode = st.toggle("LIVE_STREAM", value=True, help="Draw branches as Gemini writes them")
+        lazy_mode = st.toggle("LAZY_EXPAND", value=False, help="Generate the top two levels now and deeper branches only when you expand them")
+        if st.session_state.pop("force_lod", False):
+            st.session_state.lod_mode = True
+        lod_mode = st.toggle("LOD_VIEW", key="lod_mode", help="Send only the top levels to the browser; click a +N node to open it, double-click a node to focus it")
+        if lod_mode:
+            render_depth = st.slider("RENDER_DEPTH", min_value=1, max_value=6, value=2)
+            if st.button("RESET_VIEW"):
+                st.session_state.lod = None
         
         if st.button("RUN_ARCHITECT"):
             if topic:
-                with st.spinner("INITIATING GEMINI ARCHITECT..."):
-                    # Pass the complexity value to your Gemini function
-                    raw_tree = generate_learning_map(topic, complexity)
-                    map_result = parse_tree_to_physics(raw_tree)
-                    st.session_state.map_data = map_result
-                    # SAVE TO JSON HISTORY
-                    save_map_to_history(username, topic, map_result)
-                st.success("MAP DEPLOYED")
+                failure = None
+                with st.spinner("INITIATING GEMINI ARCHITECT..."), metrics.timer(stage="run_architect"):
+                    try:
+                        # Pass the complexity value to your Gemini function
+                        with metrics.timer(stage="generate"):
+                            if stream_mode:
+                                raw_tree = stream_to_slot(topic, complexity, graph_slot, lazy=lazy_mode)
+                            else:
+                                raw_tree = generate_learning_map(topic, complexity, lazy=lazy_mode)
+                    except Exception as e:
+                        # Retries, hedges and the retry budget are spent by now; say so instead of crashing the page
+                        failure = str(e) or type(e).__name__
+                    else:
+                        with metrics.timer(stage="parse"):
+                            map_result = parse_tree_to_physics(raw_tree)
+                        metrics.observe("map_nodes", len(map_result["nodes"]))
+                        show_map(map_result, raw_tree, topic)
+                        # SAVE TO JSON HISTORY
+                        with metrics.timer(stage="save"):
+                            save_map_to_history(username, topic, raw_tree, map_result, complexity)
+                if failure:
+                    st.error(f"ARCHITECT FAILURE: {failure}")
+                else:
+                    st.success("MAP DEPLOYED")
             else:
                 st.error("INPUT REQUIRED")
+
+        # --- BACKGROUND BATCH ---
+        batch = st.text_area("BATCH_TARGETS", help="One subject per line. Each is generated in the background and lands in ARCHIVE_LOGS")
+        if st.button("QUEUE_JOBS"):
+            queued = 0
+            for batch_topic in [line.strip() for line in batch.splitlines() if line.strip()]:
+                try:
+                    jobs.submit(username, batch_topic, complexity, lazy=lazy_mode)
+                except JobLimitError as e:
+                    st.warning(f"QUEUE FULL: {e}")
+                    break
+                queued += 1
+            if queued:
+                st.success(f"{queued} JOBS QUEUED")
+        job_panel(username)
         st.markdown('</div>', unsafe_allow_html=True)
 
-    with col2:
-        if st.session_state.map_data:
-            render_force_graph(st.session_state.map_data)
+        # --- ON-DEMAND EXPANSION ---
+        if st.session_state.map_tree:
+            target = st.selectbox(
+                "EXPAND_BRANCH",
+                leaf_paths(st.session_state.map_tree),
+                format_func=lambda path: " › ".join(path[1:]) or path[0]
+            )
+            if st.button("EXPAND_NODE"):
+                with st.spinner("EXTENDING BRANCH..."):
+                    try:
+                        children = expand_node(target, complexity)
+                    except Exception as e:
+                        children = None
+                        st.error(f"EXPANSION FAILURE: {str(e) or type(e).__name__}")
+                    if children:
+                        raw_tree = graft_children(st.session_state.map_tree, target, children)
+                        map_result = parse_tree_to_physics(raw_tree, previous=st.session_state.map_data.get("positions"))
+                        show_map(map_result, raw_tree, st.session_state.map_topic)
+                        save_map_to_history(username, st.session_state.map_topic, raw_tree, map_result)
+                        st.rerun()
+                    elif children is not None:
+                        st.warning("NO FURTHER BRANCHES")
+
+            # --- EXPORT ---
+            export_format = st.selectbox(
+                "EXPORT_FORMAT", list(EXPORTERS),
+                format_func=lambda fmt: {"md": "Markdown outline", "opml": "OPML", "graphml": "GraphML", "jsonl": "JSONL"}[fmt]
+            )
+            export_key = (st.session_state.map_hash, export_format)
+            prepared = st.session_state.get("export")
+            if not prepared or prepared["key"] != export_key:
+                # Built on request only; a rerun doesn't re-export the map.
+                # download_button holds the whole file in memory either way, so it's kept as bytes
+                if st.button("PREPARE_EXPORT"):
+                    with metrics.timer(stage="export"):
+                        data = export_bytes(st.session_state.map_tree, export_format)
+                    st.session_state.export = {"key": export_key, "data": data}
+                    st.rerun()
+            else:
+                _, extension, mime = EXPORTERS[export_format]
+                st.download_button(
+                    "DOWNLOAD_EXPORT",
+                    data=prepared["data"],
+                    file_name=f"{st.session_state.map_topic}.{extension}",
+                    mime=mime
+                )
+
+    with graph_slot:
+        if st.session_state.map_data and lod_mode:
+            render_graph_lod(st.session_state.map_data, render_depth, st.session_state.map_hash)
+        elif st.session_state.map_data:
+            render_force_graph(st.session_state.map_data, st.session_state.map_hash)
         else:
             st.markdown("<div style='height: 800px; display: flex; align-items: center; justify-content: center; opacity: 0.3; border: 1px dashed #0088ff; border-radius: 8px; font-family: monospace;'>AWAITING ARCHITECT COMMAND...</div>", unsafe_allow_html=True)
 
     # --- SIDEBAR HISTORY ---
     with st.sidebar:
         st.markdown("### ARCHIVE_LOGS")
-        users = load_users()
-        user_data = users.get(username, {})
-        history = user_data.get("history", {})
-
-        if history:
-            for saved_topic in reversed(list(history.keys())):
-                if st.button(f"📂 {saved_topic.upper()}", use_container_width=True):
-                    st.session_state.map_data = history[saved_topic]["data"]
+
+        query = st.text_input("SEARCH_ARCHIVES", placeholder="concept, term...")
+        results = search_archives(username, query)
+        for i, hit in enumerate(results):
+            if st.button(f"🔎 {hit['name'].upper()} · {hit['topic'].upper()}", key=f"hit_{i}", help=hit["description"], use_container_width=True):
+                open_archived_map(username, hit["topic"], focus=hit["node_id"])
+                st.rerun()
+        if query.strip() and not results:
+            st.write("No matching concepts.")
+        st.markdown("---")
+
+        # Only one page of the index is read and drawn; map bodies load on click
+        page = st.session_state.get("archive_page", 0)
+        entries, total = get_archive_page(username, page)
+        pages = max(1, -(-total // ARCHIVE_PAGE_SIZE))
+        if page >= pages:
+            # The last page emptied out (deletes elsewhere); step back
+            st.session_state.archive_page = pages - 1
+            st.rerun()
+
+        if entries:
+            for entry in entries:
+                saved_topic = entry["topic"]
+                details = f"{entry['timestamp']} · {entry['node_count'] or '?'} nodes"
+                if entry["complexity"]:
+                    details += f" · depth {entry['complexity']}"
+                open_col, delete_col = st.columns([5, 1])
+                if open_col.button(f"📂 {saved_topic.upper()}", key=f"open_{saved_topic}", help=details, use_container_width=True):
+                    open_archived_map(username, saved_topic)
+                    st.rerun()
+                if delete_col.button("✕", key=f"delete_{saved_topic}", help="Delete this archive"):
+                    delete_map_from_history(username, saved_topic)
+                    st.rerun()
+            if pages > 1:
+                prev_col, label_col, next_col = st.columns([1, 2, 1])
+                if prev_col.button("◀", disabled=page == 0):
+                    st.session_state.archive_page = page - 1
+                    st.rerun()
+                label_col.caption(f"PAGE {page + 1}/{pages} · {total} MAPS")
+                if next_col.button("▶", disabled=page >= pages - 1):
+                    st.session_state.archive_page = page + 1
                     st.rerun()
         else:
             st.write("No archives found.")
@@ -674,7 +1086,7 @@ def generator_page():
         st.markdown("---")
         if st.button("SHUTDOWN"):
             st.session_state.user = None
-            st.session_state.map_data = None
+            show_map(None, None, None)
             st.session_state.page = "home"
             st.rerun()
 
@@ -703,6 +1115,11 @@ def main():
 
     if "user" not in st.session_state: st.session_state.user = None
     if "map_data" not in st.session_state: st.session_state.map_data = None
+    # Raw tree and topic of the map on screen, needed to expand branches in place
+    if "map_tree" not in st.session_state: st.session_state.map_tree = None
+    if "map_topic" not in st.session_state: st.session_state.map_topic = None
+    if "map_hash" not in st.session_state: st.session_state.map_hash = None
+    if "lod_mode" not in st.session_state: st.session_state.lod_mode = False
 
     # Handle page routing
     if st.session_state.page == "home":
@@ -0,0 +1,182 @@
+import time
+import queue
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# --- RESILIENT CALLS ---
+# Per-attempt deadlines, jittered exponential retries and hedged attempts for
+# calls that can hang or come back malformed. Retries and hedges both spend
+# from a RetryBudget so a struggling upstream isn't hit with extra load.
+
+
+class DeadlineExceeded(TimeoutError):
+    """An attempt (or a stream between chunks) ran past its deadline."""
+
+
+class RetryBudget:
+    """
+    Token bucket: every first attempt deposits `ratio` tokens, every retry or
+    hedge withdraws one. With ratio=0.2 extra attempts stay under ~20% of traffic
+    once the initial `reserve` is spent.
+    """
+
+    def __init__(self, ratio=0.2, reserve=10.0):
+        self.ratio = ratio
+        self.cap = reserve
+        self._tokens = reserve
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "spent": 0, "denied": 0}
+
+    def deposit(self):
+        with self._lock:
+            self.counters["requests"] += 1
+            self._tokens = min(self.cap, self._tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self._tokens < 1:
+                self.counters["denied"] += 1
+                return False
+            self._tokens -= 1
+            self.counters["spent"] += 1
+            return True
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["tokens"] = self._tokens
+        return stats
+
+
+def backoff(attempt, base=0.5, cap=8.0, rng=random):
+    # "Full jitter": anywhere between 0 and the exponential ceiling
+    return rng.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class Caller:
+    """
+    Runs attempt() on worker threads so a hung call can be walked away from.
+    A walked-away attempt keeps its thread until the client's own timeout ends it.
+    """
+
+    def __init__(self, budget=None, workers=32):
+        self.budget = budget or RetryBudget()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="resilient-call")
+
+    def call(self, attempt, deadline=60.0, max_attempts=3, hedge_after=None, retryable=None, on_event=None):
+        """
+        attempt() must return a valid result or raise. Each round gets `deadline`
+        seconds; after hedge_after seconds a second copy is started and the first
+        valid result wins. Failed rounds are retried with jittered backoff while the
+        budget allows. on_event(name) sees "retry", "hedge", "hedge_won", "timeout",
+        "budget_exhausted".
+        """
+        notify = on_event or (lambda name: None)
+        retryable = retryable or (lambda e: True)
+        self.budget.deposit()
+        for n in range(max_attempts):
+            try:
+                return self._round(attempt, deadline, hedge_after, notify)
+            except Exception as e:
+                if isinstance(e, DeadlineExceeded):
+                    notify("timeout")
+                if n == max_attempts - 1 or not retryable(e):
+                    raise
+                if not self.budget.withdraw():
+                    notify("budget_exhausted")
+                    raise
+                notify("retry")
+                time.sleep(backoff(n))
+
+    def _round(self, attempt, deadline, hedge_after, notify):
+        started = time.monotonic()
+        first = self._pool.submit(attempt)
+        pending = {first}
+        error = None
+        hedged = hedge_after is not None and hedge_after < deadline
+
+        while pending:
+            elapsed = time.monotonic() - started
+            if hedged:
+                timeout = max(0.0, hedge_after - elapsed)
+            else:
+                timeout = max(0.0, deadline - elapsed)
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if future is not first:
+                    notify("hedge_won")
+                for other in pending:
+                    other.cancel()
+                return result
+
+            if hedged and time.monotonic() - started >= hedge_after:
+                # One extra copy per round, and only if the first is still out
+                hedged = False
+                if pending and self.budget.withdraw():
+                    notify("hedge")
+                    pending.add(self._pool.submit(attempt))
+                continue
+            if pending and time.monotonic() - started >= deadline:
+                for other in pending:
+                    other.cancel()
+                raise DeadlineExceeded(f"No response within {deadline:.0f}s")
+        raise error
+
+
+def iter_with_deadline(iterable, first_timeout, idle_timeout):
+    """
+    Yields from iterable (consumed on a helper thread), raising DeadlineExceeded
+    if the first item takes longer than first_timeout or any later gap exceeds idle_timeout.
+    """
+    items = queue.Queue(maxsize=64)
+    stop = threading.Event()
+    done = object()
+
+    def put(entry):
+        # Never block for good on a full queue: the consumer may have walked away
+        while not stop.is_set():
+            try:
+                items.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def pump():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except Exception as e:
+            put((None, e))
+        else:
+            put((done, None))
+        finally:
+            # Lets a generator source release its connection when the stream is abandoned
+            close = getattr(iterable, "close", None)
+            if close is not None:
+                close()
+
+    threading.Thread(target=pump, daemon=True, name="stream-pump").start()
+    timeout = first_timeout
+    try:
+        while True:
+            try:
+                item, error = items.get(timeout=timeout)
+            except queue.Empty:
+                raise DeadlineExceeded(f"Stream stalled for {timeout:.0f}s")
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            yield item
+            timeout = idle_timeout
+    finally:
+        stop.set()
@@ -0,0 +1,594 @@
+import os
+import json
+import zlib
+import hashlib
+import time
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from Archive import unpack_map, positions_to_xy, physics_from_tree
+from Tree import tree_to_columns
+from Metrics import metrics
+
+# --- SQLITE STORAGE ENGINE ---
+# One row per user and one row per saved map, so a save touches a single row
+# instead of rewriting every user's history. WAL lets readers run while a write commits.
+DB_PATH = os.getenv("MINDMAP_DB", "users_db.sqlite3")
+LEGACY_JSON = "users_db.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username   TEXT PRIMARY KEY,
+    password   TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS history (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    username  TEXT NOT NULL REFERENCES users(username) ON DELETE CASCADE,
+    topic     TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    data      BLOB NOT NULL,
+    format    TEXT NOT NULL DEFAULT 'json',
+    complexity INTEGER,
+    node_count INTEGER,
+    UNIQUE (username, topic)
+);
+CREATE INDEX IF NOT EXISTS history_by_user ON history(username, id);
+CREATE TABLE IF NOT EXISTS subtrees (
+    hash        TEXT PRIMARY KEY,
+    name        TEXT NOT NULL,
+    description TEXT NOT NULL,
+    children    TEXT NOT NULL,
+    refs        INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS jobs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    username    TEXT NOT NULL,
+    topic       TEXT NOT NULL,
+    complexity  INTEGER NOT NULL,
+    lazy        INTEGER NOT NULL DEFAULT 0,
+    status      TEXT NOT NULL DEFAULT 'queued',
+    error       TEXT,
+    created_at  TEXT NOT NULL,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_by_user ON jobs(username, id);
+"""
+
+# Full-text index over every saved node: one row per node, rebuilt for a topic whenever it is saved.
+# Builds of SQLite without FTS5 get a plain table and LIKE matching instead.
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS node_search USING fts5(
+    username UNINDEXED, topic UNINDEXED, node_id UNINDEXED, name, description,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+SEARCH_FALLBACK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS node_search (
+    username TEXT, topic TEXT, node_id TEXT, name TEXT, description TEXT
+);
+CREATE INDEX IF NOT EXISTS node_search_by_topic ON node_search(username, topic);
+"""
+
+_pools = {}
+_pools_lock = threading.Lock()
+# Bumped on every write made by this process
+_writes = {"count": 0}
+# Database file -> whether node_search is an FTS5 table
+_fts = {}
+
+
+def _open(path):
+    conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+
+def _pool(path):
+    # Streamlit runs each rerun on a fresh thread, so connections are pooled
+    # rather than thread-local. The first caller creates the schema and migrates
+    # a users_db.json sitting next to the database.
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = queue.LifoQueue()
+            conn = _open(path)
+            conn.executescript(SCHEMA)
+            _upgrade(conn)
+            _dedupe_archives(conn)
+            _create_search(conn, path)
+            migrate_json(conn, os.path.join(os.path.dirname(path), LEGACY_JSON))
+            _count_nodes(conn)
+            pool.put(conn)
+            _pools[path] = pool
+        return pool
+
+
+@contextmanager
+def connection(path=None):
+    pool = _pool(path or DB_PATH)
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        conn = _open(path or DB_PATH)
+    try:
+        yield conn
+    finally:
+        pool.put(conn)
+
+
+@contextmanager
+def transaction(conn):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def _upgrade(conn):
+    # Databases created before the compact archive format have no 'format' column
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(history)")]
+    if "format" not in columns:
+        conn.execute("ALTER TABLE history ADD COLUMN format TEXT NOT NULL DEFAULT 'json'")
+    # ...and the ones before the metadata index have no complexity/node_count
+    if "complexity" not in columns:
+        conn.execute("ALTER TABLE history ADD COLUMN complexity INTEGER")
+    if "node_count" not in columns:
+        conn.execute("ALTER TABLE history ADD COLUMN node_count INTEGER")
+
+
+def _count_nodes(conn):
+    rows = conn.execute("SELECT id, data, format FROM history WHERE node_count IS NULL").fetchall()
+    if not rows:
+        return
+    with transaction(conn):
+        for row_id, data, fmt in rows:
+            count = sum(1 for _ in _nodes(conn, data, fmt))
+            conn.execute("UPDATE history SET node_count = ? WHERE id = ?", (count, row_id))
+
+
+def _create_search(conn, path):
+    fresh = not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'node_search'").fetchone()
+    if fresh:
+        try:
+            conn.executescript(SEARCH_SCHEMA)
+        except sqlite3.OperationalError:
+            conn.executescript(SEARCH_FALLBACK_SCHEMA)
+    _fts[path] = bool(conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'node_search' AND sql LIKE '%fts5%'"
+    ).fetchone())
+    if fresh:
+        # Maps saved before the index existed
+        with transaction(conn):
+            for username, topic, data, fmt in conn.execute(
+                "SELECT username, topic, data, format FROM history"
+            ).fetchall():
+                _index_nodes(conn, username, topic, _nodes(conn, data, fmt))
+
+
+def _wrote():
+    with _pools_lock:
+        _writes["count"] += 1
+
+
+def version(path=None):
+    """
+    Cheap change token: our own write counter plus the size/mtime of the database
+    and its WAL, which move whenever another process commits. Costs two stat calls.
+    """
+    path = path or DB_PATH
+    sig = [_writes["count"]]
+    for p in (path, path + "-wal"):
+        try:
+            st = os.stat(p)
+            sig.extend((st.st_mtime_ns, st.st_size))
+        except OSError:
+            sig.extend((0, 0))
+    return tuple(sig)
+
+
+def migrate_json(conn, json_path):
+    """One-shot import of the old users_db.json. The file is renamed once imported."""
+    if not os.path.exists(json_path):
+        return 0
+    if conn.execute("SELECT 1 FROM users LIMIT 1").fetchone():
+        return 0
+    with open(json_path, "r") as f:
+        try:
+            users = json.load(f)
+        except ValueError:
+            return 0
+
+    now = time.strftime("%Y-%m-%d %H:%M:%S")
+    with transaction(conn):
+        for username, record in users.items():
+            conn.execute(
+                "INSERT OR IGNORE INTO users (username, password, created_at) VALUES (?, ?, ?)",
+                (username, record.get("password", ""), now),
+            )
+            for topic, entry in record.get("history", {}).items():
+                data = json.dumps(entry.get("data"))
+                conn.execute(
+                    "INSERT OR REPLACE INTO history (username, topic, timestamp, data) VALUES (?, ?, ?, ?)",
+                    (username, topic, entry.get("timestamp", now), data),
+                )
+                _index_nodes(conn, username, topic, _nodes(conn, data, "json"))
+    os.replace(json_path, json_path + ".migrated")
+    return len(users)
+
+
+# --- USERS ---
+@metrics.timer("storage_seconds", op="get_user")
+def get_user(username, path=None):
+    with connection(path) as conn:
+        row = conn.execute("SELECT password FROM users WHERE username = ?", (username,)).fetchone()
+    return {"password": row[0]} if row else None
+
+
+@metrics.timer("storage_seconds", op="create_user")
+def create_user(username, password, path=None):
+    """Returns False if the username was already taken."""
+    with connection(path) as conn:
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO users (username, password, created_at) VALUES (?, ?, ?)",
+            (username, password, time.strftime("%Y-%m-%d %H:%M:%S")),
+        )
+    _wrote()
+    return cur.rowcount == 1
+
+
+# --- SUBTREE STORE ---
+# Every node is stored once per distinct (name, description, children) and
+# addressed by a hash of exactly that, so a branch two maps share is one set of rows.
+# refs counts the parents (or history rows) pointing at a subtree; at zero it is deleted.
+def subtree_hash(name, description, child_hashes):
+    raw = "\x1f".join([name, description] + list(child_hashes)).encode("utf-8")
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def _put_subtree(conn, tree):
+    """Stores tree bottom-up and returns the root hash. Nothing is referenced yet."""
+    hashes = {}
+    stack = [(tree, False)]
+    while stack:
+        node, ready = stack.pop()
+        children = node.get("children") or []
+        if not ready:
+            stack.append((node, True))
+            stack.extend((child, False) for child in children)
+            continue
+        child_hashes = [hashes[id(child)] for child in children]
+        name, description = node.get("name", ""), node.get("description", "")
+        h = subtree_hash(name, description, child_hashes)
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO subtrees (hash, name, description, children) VALUES (?, ?, ?, ?)",
+            (h, name, description, " ".join(child_hashes)),
+        )
+        if cur.rowcount == 1:
+            # A new parent: each child (existing or just added) gains a reference
+            conn.executemany("UPDATE subtrees SET refs = refs + 1 WHERE hash = ?", [(c,) for c in child_hashes])
+        hashes[id(node)] = h
+    return hashes[id(tree)]
+
+
+def _release(conn, root):
+    stack = [root]
+    while stack:
+        h = stack.pop()
+        conn.execute("UPDATE subtrees SET refs = refs - 1 WHERE hash = ?", (h,))
+        row = conn.execute("SELECT refs, children FROM subtrees WHERE hash = ?", (h,)).fetchone()
+        if row and row[0] <= 0:
+            conn.execute("DELETE FROM subtrees WHERE hash = ?", (h,))
+            stack.extend(row[1].split())
+
+
+def _get_subtree(conn, root):
+    # One query per level rather than per node
+    rows = {}
+    frontier = {root}
+    while frontier:
+        wanted = list(frontier)
+        frontier = set()
+        for i in range(0, len(wanted), 500):
+            chunk = wanted[i:i + 500]
+            for h, name, description, children in conn.execute(
+                f"SELECT hash, name, description, children FROM subtrees WHERE hash IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ):
+                rows[h] = (name, description, children.split())
+                frontier.update(c for c in rows[h][2] if c not in rows)
+    if root not in rows:
+        return None
+
+    # A subtree repeated within the map still becomes separate dicts
+    tree = {"name": rows[root][0], "description": rows[root][1], "children": []}
+    stack = [(root, tree)]
+    while stack:
+        h, node = stack.pop()
+        for c in rows[h][2]:
+            child = {"name": rows[c][0], "description": rows[c][1], "children": []}
+            node["children"].append(child)
+            stack.append((c, child))
+    return tree
+
+
+def _subtree_ref(data):
+    ref = json.loads(zlib.decompress(data))
+    return ref["root"], ref.get("xy")
+
+
+def _dedupe_archives(conn):
+    # Whole-map archives from before the subtree store move into it once
+    rows = conn.execute("SELECT id, data FROM history WHERE format = 'archive'").fetchall()
+    if not rows:
+        return
+    with transaction(conn):
+        for row_id, data in rows:
+            archived = unpack_map(data)
+            conn.execute(
+                "UPDATE history SET data = ?, format = 'subtree' WHERE id = ?",
+                (_reference(conn, archived.tree, archived.xy), row_id),
+            )
+
+
+def _reference(conn, tree, xy):
+    root = _put_subtree(conn, tree)
+    conn.execute("UPDATE subtrees SET refs = refs + 1 WHERE hash = ?", (root,))
+    ref = {"root": root}
+    if xy:
+        ref["xy"] = xy
+    return zlib.compress(json.dumps(ref, separators=(",", ":")).encode("utf-8"))
+
+
+# --- HISTORY ---
+# Rows are 'subtree' (root hash into the subtree store plus positions), 'archive'
+# (Archive.py blob of the raw tree, converted to 'subtree' on open) or 'json'
+# (physics dicts migrated from users_db.json, which have no raw tree).
+@metrics.timer("storage_seconds", op="save_map")
+def save_map(username, topic, tree, positions=None, complexity=None, path=None):
+    # Re-saving a topic keeps its original position (and complexity, unless given),
+    # like the old dict-based history did
+    columns = tree_to_columns(tree)
+    xy = positions_to_xy(columns["id"], positions) if positions else None
+    with connection(path) as conn, transaction(conn):
+        if not conn.execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone():
+            return False
+        old = conn.execute(
+            "SELECT data, format FROM history WHERE username = ? AND topic = ?", (username, topic)
+        ).fetchone()
+        blob = _reference(conn, tree, xy)
+        conn.execute(
+            """
+            INSERT INTO history (username, topic, timestamp, data, format, complexity, node_count)
+            VALUES (?, ?, ?, ?, 'subtree', ?, ?)
+            ON CONFLICT (username, topic) DO UPDATE SET
+                data = excluded.data, timestamp = excluded.timestamp, format = excluded.format,
+                complexity = COALESCE(excluded.complexity, history.complexity), node_count = excluded.node_count
+            """,
+            (username, topic, time.strftime("%Y-%m-%d %H:%M:%S"), blob, complexity, len(columns["id"])),
+        )
+        # Released after the new reference is taken, so branches both versions share never hit zero
+        if old and old[1] == "subtree":
+            _release(conn, _subtree_ref(old[0])[0])
+        _index_nodes(conn, username, topic, zip(columns["id"], columns["name"], columns["description"]))
+    metrics.observe("storage_bytes", len(blob), op="save_map")
+    _wrote()
+    return True
+
+
+@metrics.timer("storage_seconds", op="delete_map")
+def delete_map(username, topic, path=None):
+    """Removes a saved map and reclaims subtrees nothing else refers to. False if it didn't exist."""
+    with connection(path) as conn, transaction(conn):
+        row = conn.execute(
+            "SELECT data, format FROM history WHERE username = ? AND topic = ?", (username, topic)
+        ).fetchone()
+        if not row:
+            return False
+        conn.execute("DELETE FROM history WHERE username = ? AND topic = ?", (username, topic))
+        if row[1] == "subtree":
+            _release(conn, _subtree_ref(row[0])[0])
+        conn.execute("DELETE FROM node_search WHERE username = ? AND topic = ?", (username, topic))
+    _wrote()
+    return True
+
+
+@metrics.timer("storage_seconds", op="list_topics")
+def list_topics(username, path=None):
+    """Topics in the order they were first saved."""
+    with connection(path) as conn:
+        rows = conn.execute("SELECT topic FROM history WHERE username = ? ORDER BY id", (username,)).fetchall()
+    return [r[0] for r in rows]
+
+
+@metrics.timer("storage_seconds", op="list_history")
+def list_history(username, limit=None, offset=0, path=None):
+    """
+    One page of the user's history index, newest first, without touching map bodies:
+    [{"topic", "timestamp", "complexity", "node_count"}].
+    """
+    with connection(path) as conn:
+        rows = conn.execute(
+            """
+            SELECT topic, timestamp, complexity, node_count FROM history
+            WHERE username = ? ORDER BY id DESC LIMIT ? OFFSET ?
+            """,
+            (username, -1 if limit is None else limit, offset),
+        ).fetchall()
+    return [{"topic": t, "timestamp": ts, "complexity": c, "node_count": n} for t, ts, c, n in rows]
+
+
+def count_history(username, path=None):
+    with connection(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM history WHERE username = ?", (username,)).fetchone()[0]
+
+
+def _tree(conn, data, fmt):
+    if fmt == "subtree":
+        return _get_subtree(conn, _subtree_ref(data)[0])
+    if fmt == "archive":
+        return unpack_map(data).tree
+    return None
+
+
+def _physics(conn, data, fmt):
+    if fmt == "subtree":
+        root, xy = _subtree_ref(data)
+        return physics_from_tree(_get_subtree(conn, root), xy)
+    if fmt == "archive":
+        return unpack_map(data).physics
+    return json.loads(data)
+
+
+def _nodes(conn, data, fmt):
+    # (id, name, description) for every node of a stored map
+    tree = _tree(conn, data, fmt)
+    if tree is not None:
+        columns = tree_to_columns(tree)
+        return zip(columns["id"], columns["name"], columns["description"])
+    physics = json.loads(data) or {}
+    return [(n["id"], n.get("label", ""), n.get("description", "")) for n in physics.get("nodes", [])]
+
+
+@metrics.timer("storage_seconds", op="load_map")
+def load_map(username, topic, path=None):
+    """The saved map as the renderer's physics dict, or None."""
+    with connection(path) as conn:
+        row = conn.execute(
+            "SELECT data, format FROM history WHERE username = ? AND topic = ?", (username, topic)
+        ).fetchone()
+        return _physics(conn, *row) if row else None
+
+
+@metrics.timer("storage_seconds", op="load_tree")
+def load_tree(username, topic, path=None):
+    """The saved raw tree, or None (also for migrated maps that never had one)."""
+    with connection(path) as conn:
+        row = conn.execute(
+            "SELECT data, format FROM history WHERE username = ? AND topic = ?", (username, topic)
+        ).fetchone()
+        return _tree(conn, *row) if row else None
+
+
+# --- JOBS ---
+# Status of background generations (see Jobs.py): queued -> running -> done | failed
+@metrics.timer("storage_seconds", op="create_job")
+def create_job(username, topic, complexity, lazy=False, path=None):
+    with connection(path) as conn:
+        cur = conn.execute(
+            "INSERT INTO jobs (username, topic, complexity, lazy, created_at) VALUES (?, ?, ?, ?, ?)",
+            (username, topic, int(complexity), int(bool(lazy)), time.strftime("%Y-%m-%d %H:%M:%S")),
+        )
+    _wrote()
+    return cur.lastrowid
+
+
+def set_job_status(job_id, status, error=None, path=None):
+    finished = time.strftime("%Y-%m-%d %H:%M:%S") if status in ("done", "failed") else None
+    with connection(path) as conn:
+        conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+            (status, error, finished, job_id),
+        )
+    _wrote()
+
+
+@metrics.timer("storage_seconds", op="list_jobs")
+def list_jobs(username, limit=20, path=None):
+    """The user's most recent jobs, newest first."""
+    with connection(path) as conn:
+        rows = conn.execute(
+            """
+            SELECT id, topic, complexity, status, error, created_at, finished_at FROM jobs
+            WHERE username = ? ORDER BY id DESC LIMIT ?
+            """,
+            (username, limit),
+        ).fetchall()
+    keys = ("id", "topic", "complexity", "status", "error", "created_at", "finished_at")
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def fail_unfinished_jobs(before, error="Interrupted by a server restart", path=None):
+    """
+    Jobs a previous process left queued or running never will finish; say so.
+    Only rows created before `before` (a created_at timestamp) are touched, so jobs
+    other live processes queued since are left alone.
+    """
+    with connection(path) as conn:
+        cur = conn.execute(
+            """
+            UPDATE jobs SET status = 'failed', error = ?, finished_at = ?
+            WHERE status IN ('queued', 'running') AND created_at < ?
+            """,
+            (error, time.strftime("%Y-%m-%d %H:%M:%S"), before),
+        )
+    if cur.rowcount:
+        _wrote()
+    return cur.rowcount
+
+
+# --- SEARCH ---
+def _index_nodes(conn, username, topic, nodes):
+    conn.execute("DELETE FROM node_search WHERE username = ? AND topic = ?", (username, topic))
+    conn.executemany(
+        "INSERT INTO node_search (username, topic, node_id, name, description) VALUES (?, ?, ?, ?, ?)",
+        ((username, topic, node_id, name, description) for node_id, name, description in nodes),
+    )
+
+
+def _match_expression(query):
+    # Every word must appear; the last one may be a prefix of a word (search-as-you-type)
+    words = [w.replace('"', '""') for w in query.split()]
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+@metrics.timer("storage_seconds", op="search")
+def search(username, query, limit=20, path=None):
+    """
+    Nodes across username's saved maps matching query, best first:
+    [{"topic", "node_id", "name", "description"}]. Names weigh more than descriptions.
+    """
+    expression = _match_expression(query)
+    if expression is None:
+        return []
+    with connection(path) as conn:
+        if _fts.get(path or DB_PATH):
+            rows = conn.execute(
+                """
+                SELECT topic, node_id, name, description FROM node_search
+                WHERE node_search MATCH ? AND username = ?
+                ORDER BY bm25(node_search, 0, 0, 0, 5.0, 1.0) LIMIT ?
+                """,
+                (expression, username, limit),
+            ).fetchall()
+        else:
+            where = " AND ".join(["(name LIKE ? OR description LIKE ?)"] * len(query.split()))
+            params = [p for w in query.split() for p in (f"%{w}%", f"%{w}%")]
+            rows = conn.execute(
+                f"SELECT topic, node_id, name, description FROM node_search WHERE username = ? AND {where} LIMIT ?",
+                [username] + params + [limit],
+            ).fetchall()
+    return [{"topic": t, "node_id": i, "name": n, "description": d} for t, i, n, d in rows]
+
+
+def load_all(path=None):
+    """Everything, in the old users_db.json shape. Slow; for tooling only."""
+    users = {}
+    with connection(path) as conn:
+        for username, password in conn.execute("SELECT username, password FROM users"):
+            users[username] = {"password": password, "history": {}}
+        for username, topic, timestamp, data, fmt in conn.execute(
+            "SELECT username, topic, timestamp, data, format FROM history ORDER BY id"
+        ).fetchall():
+            users[username]["history"][topic] = {"data": _physics(conn, data, fmt), "timestamp": timestamp}
+    return users
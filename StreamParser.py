@@ -0,0 +1,118 @@
+import json
+
+# --- INCREMENTAL TREE PARSER ---
+# Consumes the model's JSON a chunk at a time and reports every
+# {"name", "description", "children"} node the moment its closing brace arrives.
+# The compact keys of the structured-output schema ("n", "d", "c") are read as the long ones.
+KEYS = {"n": "name", "d": "description", "c": "children"}
+
+
+class TreeStreamParser:
+    def __init__(self):
+        self.stack = []      # open containers, outermost first
+        self.root = None     # set once the top-level node closes
+        self.node_count = 0
+        self._string = None  # chars of the string being read, or None
+        self._escape = False
+
+    def feed(self, text):
+        """
+        Feed the next chunk of text.
+        Returns a list of (depth, node) tuples for the nodes completed by this chunk.
+        """
+        completed = []
+        for ch in text:
+            if self._string is not None:
+                self._string.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._on_string(json.loads("".join(self._string)))
+                    self._string = None
+            elif ch == '"':
+                self._string = [ch]
+            elif ch == "{":
+                self.stack.append(self._frame("obj"))
+            elif ch == "[":
+                self.stack.append(self._frame("arr"))
+            elif ch == "}" and self.stack and self.stack[-1]["type"] == "obj":
+                done = self._close_object()
+                if done is not None:
+                    completed.append(done)
+            elif ch == "]" and self.stack and self.stack[-1]["type"] == "arr":
+                self.stack.pop()
+            elif ch == "," and self.stack and self.stack[-1]["type"] == "obj":
+                self.stack[-1]["expect_key"] = True
+        return completed
+
+    def partial_tree(self):
+        """Snapshot of everything known so far, including nodes that are still open."""
+        if self.root is not None:
+            return self.root
+
+        partial = None
+        parent = None
+        for i, frame in enumerate(self.stack):
+            if frame["type"] != "obj":
+                continue
+            if frame["name"] is None or (parent is not None and not self._is_child_slot(i)):
+                break
+            node = {
+                "name": frame["name"],
+                "description": frame["description"] or "",
+                "children": list(frame["children"]),
+            }
+            if parent is None:
+                partial = node
+            else:
+                parent["children"].append(node)
+            parent = node
+        return partial
+
+    # --- INTERNALS ---
+    def _frame(self, kind):
+        parent_key = None
+        if self.stack and self.stack[-1]["type"] == "obj":
+            parent_key = self.stack[-1]["key"]
+        return {
+            "type": kind,
+            "parent_key": parent_key,
+            "expect_key": kind == "obj",
+            "key": None,
+            "name": None,
+            "description": None,
+            "children": [],
+        }
+
+    def _on_string(self, value):
+        if not self.stack or self.stack[-1]["type"] != "obj":
+            return
+        frame = self.stack[-1]
+        if frame["expect_key"]:
+            frame["key"] = KEYS.get(value, value)
+            frame["expect_key"] = False
+        elif frame["key"] in ("name", "description"):
+            frame[frame["key"]] = value
+
+    def _is_child_slot(self, i):
+        # stack[i] is an object sitting directly inside some node's "children" array
+        return i >= 2 and self.stack[i - 1]["type"] == "arr" and self.stack[i - 1]["parent_key"] == "children"
+
+    def _close_object(self):
+        i = len(self.stack) - 1
+        is_child = self._is_child_slot(i)
+        frame = self.stack.pop()
+        if frame["name"] is None:
+            return None
+
+        node = {"name": frame["name"], "description": frame["description"] or "", "children": frame["children"]}
+        self.node_count += 1
+        if is_child:
+            self.stack[-2]["children"].append(node)
+        elif self.root is None and not any(f["type"] == "obj" for f in self.stack):
+            # Top-level node (optionally wrapped in a bare array)
+            self.root = node
+        depth = sum(1 for f in self.stack if f["type"] == "obj")
+        return depth, node
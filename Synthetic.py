@@ -0,0 +1,55 @@
+import random
+import Storage
+
+# --- SYNTHETIC DATA ---
+# Seeded stand-ins for Gemini output and for a populated user database,
+# so the pipeline can be measured at sizes we don't have real data for.
+
+WORDS = (
+    "vector matrix kernel gradient entropy lattice tensor proof theorem signal network "
+    "protocol compiler memory cache graph field ring group limit series integral model "
+    "sample variance bias layer token stream buffer schema index query shard replica"
+).split()
+
+
+def synthetic_tree(breadth=4, depth=3, desc_words=25, seed=0, topic=None):
+    """
+    A full tree: every node down to depth has `breadth` children.
+    Node count is (breadth ** (depth + 1) - 1) / (breadth - 1).
+    """
+    rng = random.Random(seed)
+
+    def text(n):
+        return " ".join(rng.choice(WORDS) for _ in range(n))
+
+    root = {"name": topic or text(2).title(), "description": text(desc_words), "children": []}
+    stack = [(root, 0)]
+    while stack:
+        node, level = stack.pop()
+        if level == depth:
+            continue
+        for i in range(breadth):
+            child = {"name": f"{text(2).title()} {level + 1}.{i}", "description": text(desc_words), "children": []}
+            node["children"].append(child)
+            stack.append((child, level + 1))
+    return root
+
+
+def synthetic_users(path, users=10, maps_per_user=5, breadth=4, depth=3, desc_words=25, seed=0):
+    """Fills the database at path with users and saved maps. Returns the usernames."""
+    from Layout import compute_layout
+    from Tree import tree_to_columns
+
+    rng = random.Random(seed)
+    names = []
+    for u in range(users):
+        username = f"user{u:05d}"
+        Storage.create_user(username, "pw", path=path)
+        for m in range(maps_per_user):
+            tree = synthetic_tree(breadth, depth, desc_words, seed=rng.randrange(1 << 30), topic=f"Topic {u}-{m}")
+            columns = tree_to_columns(tree)
+            # Positions only need to exist (they take up space like real ones), so skip the force pass
+            positions = compute_layout(columns["id"], columns["parent"], iterations=0)
+            Storage.save_map(username, tree["name"], tree, positions, path=path)
+        names.append(username)
+    return names
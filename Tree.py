@@ -0,0 +1,153 @@
+import copy
+import hashlib
+from array import array
+
+# --- TREE COLUMNS ---
+# The raw {"name", "description", "children"} tree flattened into parallel
+# columns in pre-order: node 0 is the root and every parent comes before its children.
+
+PATH_SEP = "\x1f"
+
+
+def path_id(path):
+    # Same ancestor chain -> same id, no matter how the rest of the tree changes.
+    # Children hash their parent's id rather than the whole path, so each node costs O(1)
+    return hashlib.blake2b(path.encode("utf-8"), digest_size=6).hexdigest()
+
+
+def tree_to_columns(tree):
+    """
+    Walks the tree with an explicit stack (no recursion limit).
+    Returns {"id": [...], "name": [...], "description": [...], "parent": array, "depth": array}
+    where parent[i] is the row of node i's parent and -1 for the root.
+    """
+    ids, names, descriptions = [], [], []
+    parents, depths = array("i"), array("i")
+    seen = set()
+
+    stack = [(tree, -1, 0, None)]
+    while stack:
+        node, parent, depth, parent_id = stack.pop()
+        name = node.get("name", "")
+
+        node_id = path_id(parent_id + PATH_SEP + name if parent_id is not None else name)
+        if node_id in seen:
+            # Siblings sharing a name: number the repeats in walk order
+            n = 1
+            while f"{node_id}-{n}" in seen:
+                n += 1
+            node_id = f"{node_id}-{n}"
+        seen.add(node_id)
+
+        row = len(ids)
+        ids.append(node_id)
+        names.append(name)
+        descriptions.append(node.get("description", ""))
+        parents.append(parent)
+        depths.append(depth)
+
+        children = node.get("children") or []
+        for child in reversed(children):
+            stack.append((child, row, depth + 1, node_id))
+
+    return {"id": ids, "name": names, "description": descriptions, "parent": parents, "depth": depths}
+
+
+
+def columns_to_tree(columns):
+    """Inverse of tree_to_columns."""
+    nodes = [
+        {"name": name, "description": description, "children": []}
+        for name, description in zip(columns["name"], columns["description"])
+    ]
+    for row, parent in enumerate(columns["parent"]):
+        if parent >= 0:
+            nodes[parent]["children"].append(nodes[row])
+    return nodes[0] if nodes else None
+
+
+def columns_to_physics(columns, positions=None):
+    """The {"nodes", "edges"} structure the graph renderer draws."""
+    ids = columns["id"]
+    parents = columns["parent"]
+    nodes = []
+    edges = []
+
+    for row, node_id in enumerate(ids):
+        # Back to the original balanced sizes
+        nodes.append({
+            "id": node_id,
+            "label": columns["name"][row].upper(),
+            "size": 60 if row == 0 else 40,
+            "description": columns["description"][row]
+        })
+        if parents[row] >= 0:
+            edges.append({"source": ids[parents[row]], "target": node_id})
+
+    result = {"nodes": nodes, "edges": edges}
+    if positions:
+        result["positions"] = positions
+    return result
+
+
+# --- COMPACT MODEL OUTPUT ---
+COMPACT_KEYS = (("n", "name"), ("d", "description"), ("c", "children"))
+
+
+def expand_compact(tree):
+    """
+    {"n", "d", "c"} model output -> the usual {"name", "description", "children"}
+    nodes, validating the shape on the same pass. Long keys are accepted too.
+    Raises ValueError on anything that isn't a tree of named nodes.
+    """
+    if isinstance(tree, list) and len(tree) == 1:
+        tree = tree[0]  # Some responses wrap the root in a bare array
+    root = {}
+    stack = [(tree, root)]
+    while stack:
+        raw, node = stack.pop()
+        if not isinstance(raw, dict):
+            raise ValueError(f"Expected a node object, got {type(raw).__name__}")
+        values = {}
+        for short, long in COMPACT_KEYS:
+            values[long] = raw[short] if short in raw else raw.get(long)
+        name, description, children = values["name"], values["description"], values["children"]
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError("Node without a name")
+        if description is not None and not isinstance(description, str):
+            raise ValueError(f"Description of '{name}' is not text")
+        if children is not None and not isinstance(children, list):
+            raise ValueError(f"Children of '{name}' are not a list")
+        node["name"] = name
+        node["description"] = description or ""
+        node["children"] = [{} for _ in children or ()]
+        for raw_child, child in zip(reversed(children or ()), reversed(node["children"])):
+            stack.append((raw_child, child))
+    return root
+
+
+# --- ON-DEMAND EXPANSION ---
+def leaf_paths(tree):
+    """Name paths (root first) of every node that has no children yet, in pre-order."""
+    paths = []
+    stack = [(tree, [tree.get("name", "")])]
+    while stack:
+        node, path = stack.pop()
+        children = node.get("children") or []
+        if not children:
+            paths.append(path)
+        for child in reversed(children):
+            stack.append((child, path + [child.get("name", "")]))
+    return paths
+
+
+def graft_children(tree, path, children):
+    """Copy of tree with children attached under the node at path (first match per level)."""
+    tree = copy.deepcopy(tree)
+    node = tree
+    for name in path[1:]:
+        node = next((c for c in node.get("children") or [] if c.get("name") == name), None)
+        if node is None:
+            raise KeyError(" > ".join(path))
+    node["children"] = (node.get("children") or []) + copy.deepcopy(children)
+    return tree